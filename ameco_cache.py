@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from persist import atomic_write
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Directory holding the parsed workbooks and the manifest describing them
+CACHE_DIR = ".ameco_cache"
+MANIFEST_NAME = "manifest.json"
+CACHED_FRAME = re.compile(r"[0-9a-f]{64}\.(parquet|pickle)")
+
+# AMECO workbooks, and AMECO-style tables written as CSV (see owid_ameco)
+WORKBOOK_SUFFIXES = (".xlsx", ".ameco.csv")
+
+
+def file_fingerprint(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 digest of a file's content.
+
+    Args:
+        path: Path of the file to hash
+        chunk_size: Number of bytes read at a time
+
+    Returns:
+        The hexadecimal digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_workbooks(directory: str = ".") -> List[str]:
+    """
+    Lists the workbooks of a directory, sorted by name.
+
+    Args:
+        directory: Directory to list
+
+    Returns:
+        The names of the files ending with one of WORKBOOK_SUFFIXES
+    """
+    return sorted(
+        f for f in os.listdir(directory) if f.lower().endswith(WORKBOOK_SUFFIXES)
+    )
+
+
+def read_workbook(path: str) -> pd.DataFrame:
+    """
+    Reads an AMECO workbook, or an AMECO-style CSV table.
+
+    Args:
+        path: Path of the workbook
+
+    Returns:
+        The DataFrame of the workbook, with integer year column names
+    """
+    import pandas as pd
+
+    if not path.lower().endswith(".csv"):
+        return pd.read_excel(path)
+    df = pd.read_csv(path)
+    # CSV headers are text, the year columns of the Excel workbooks are ints
+    df.columns = [int(c) if c.isdigit() else c for c in df.columns]
+    return df
+
+
+def _cache_format() -> str:
+    # Parquet needs pyarrow, fall back to pickle when it is not installed
+    try:
+        import pyarrow  # noqa: F401
+
+        return "parquet"
+    except ImportError:
+        return "pickle"
+
+
+def _write_frame(df: pd.DataFrame, cache_path: str, fmt: str):
+    # Write to a temporary file first so a concurrent reader never sees half a file
+    with atomic_write(cache_path) as f:
+        if fmt == "parquet":
+            # Parquet only accepts string column names, the year columns are ints
+            stored = df.copy(deep=False)
+            stored.columns = [str(column) for column in df.columns]
+            stored.to_parquet(f, index=False)
+        else:
+            df.to_pickle(f)
+
+
+def _read_frame(cache_path: str, fmt: str) -> pd.DataFrame:
+    import pandas as pd
+
+    if fmt == "parquet":
+        df = pd.read_parquet(cache_path)
+        # Restore the integer year column names written as strings
+        df.columns = [int(c) if c.isdigit() else c for c in df.columns]
+        return df
+    return pd.read_pickle(cache_path)
+
+
+def load_manifest(cache_dir: str = CACHE_DIR) -> Dict[str, dict]:
+    """
+    Loads the cache manifest, mapping absolute workbook paths to their cache entry.
+
+    Args:
+        cache_dir: Directory holding the cache
+
+    Returns:
+        The manifest, empty if the cache does not exist yet or is unreadable
+    """
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: Dict[str, dict], cache_dir: str = CACHE_DIR):
+    """
+    Atomically writes the cache manifest.
+
+    Args:
+        manifest: Mapping of absolute workbook paths to their cache entry
+        cache_dir: Directory holding the cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    with atomic_write(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def current_fingerprint(path: str, manifest: Dict[str, dict]) -> str:
+    """
+    Returns the content hash of a workbook, hashing it only if it may have changed.
+
+    The size and modification time are checked first so that unchanged files are
+    never hashed. A file that was only touched keeps its manifest entry, whose
+    stat fields are refreshed.
+
+    Args:
+        path: Path of the workbook
+        manifest: Cache manifest, updated in place when stat fields are refreshed
+
+    Returns:
+        The SHA-256 digest of the workbook content
+    """
+    entry = manifest.get(os.path.abspath(path))
+    stat = os.stat(path)
+    if entry is not None and stat.st_size == entry["size"]:
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return entry["sha256"]
+        sha256 = file_fingerprint(path)
+        if sha256 == entry["sha256"]:
+            entry["mtime_ns"] = stat.st_mtime_ns
+        return sha256
+    return file_fingerprint(path)
+
+
+def lookup_cached(
+    path: str, manifest: Dict[str, dict], cache_dir: str = CACHE_DIR
+) -> Optional[pd.DataFrame]:
+    """
+    Returns the cached frame of a workbook if it has not changed since it was cached.
+
+    Args:
+        path: Path of the workbook
+        manifest: Cache manifest, updated in place when stat fields are refreshed
+        cache_dir: Directory holding the cache
+
+    Returns:
+        The cached DataFrame, or None if the workbook must be parsed again
+    """
+    entry = manifest.get(os.path.abspath(path))
+    if entry is None:
+        return None
+
+    cache_path = os.path.join(cache_dir, entry["cache_file"])
+    if not os.path.exists(cache_path):
+        return None
+
+    if current_fingerprint(path, manifest) != entry["sha256"]:
+        return None
+
+    try:
+        return _read_frame(cache_path, entry["format"])
+    except Exception as e:
+        print(f"Error reading cache for {path}: {str(e)}")
+        return None
+
+
+def parse_and_store(path: str, cache_dir: str = CACHE_DIR):
+    """
+    Parses a workbook and writes its frame to the cache.
+
+    This does not touch the manifest, so it is safe to call from worker processes;
+    the caller records the returned entry.
+
+    Args:
+        path: Path of the workbook
+        cache_dir: Directory holding the cache
+
+    Returns:
+        A tuple (entry, DataFrame) where entry is the manifest entry of the workbook
+    """
+    stat = os.stat(path)
+    sha256 = file_fingerprint(path)
+    df = read_workbook(path)
+
+    fmt = _cache_format()
+    cache_file = f"{sha256}.{fmt}"
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_frame(df, os.path.join(cache_dir, cache_file), fmt)
+
+    entry = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "cache_file": cache_file,
+        "format": fmt,
+    }
+    return entry, df
+
+
+def load_workbooks(
+    paths: List[str], workers: Optional[int] = None, cache_dir: str = CACHE_DIR
+) -> Tuple[List[pd.DataFrame], Dict[str, Exception]]:
+    """
+    Reads workbooks through the on-disk cache, parsing the changed ones in parallel.
+
+    Cached workbooks are loaded in the calling process. The others are spread over
+    a process pool, and a file that fails to parse does not discard the rest.
+
+    Args:
+        paths: Paths of the workbooks to read
+        workers: Number of worker processes, defaults to the number of CPUs.
+            With 1 worker the workbooks are parsed in the calling process.
+        cache_dir: Directory holding the cache
+
+    Returns:
+        A tuple (frames, errors). frames holds the DataFrames of the workbooks that
+        were read, in the order of paths, and errors maps the paths of the others
+        to the exception raised while reading them
+    """
+    manifest = load_manifest(cache_dir)
+    results: Dict[str, pd.DataFrame] = {}
+    errors: Dict[str, Exception] = {}
+    to_parse = []
+
+    for path in paths:
+        try:
+            df = lookup_cached(path, manifest, cache_dir)
+        except OSError as e:
+            errors[path] = e
+            continue
+        if df is None:
+            to_parse.append(path)
+        else:
+            results[path] = df
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(to_parse)))
+
+    if workers == 1:
+        for path in to_parse:
+            try:
+                entry, results[path] = parse_and_store(path, cache_dir)
+                manifest[os.path.abspath(path)] = entry
+            except Exception as e:
+                errors[path] = e
+    elif to_parse:
+        # Submit the largest workbooks first so no worker is left with a big one
+        to_parse.sort(key=os.path.getsize, reverse=True)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(parse_and_store, path, cache_dir): path
+                for path in to_parse
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    entry, results[path] = future.result()
+                    manifest[os.path.abspath(path)] = entry
+                except Exception as e:
+                    errors[path] = e
+
+    save_manifest(manifest, cache_dir)
+    prune_cache(manifest, cache_dir)
+
+    frames = []
+    for path in paths:
+        if path in results:
+            df = results[path]
+            # Remember where each frame comes from, the series index is keyed on it
+            df.attrs["path"] = path
+            df.attrs["sha256"] = manifest[os.path.abspath(path)]["sha256"]
+            frames.append(df)
+    return frames, errors
+
+
+def prune_cache(manifest: Dict[str, dict], cache_dir: str = CACHE_DIR):
+    """
+    Deletes cached frames that no manifest entry refers to anymore.
+
+    Args:
+        manifest: Cache manifest
+        cache_dir: Directory holding the cache
+    """
+    referenced = {entry["cache_file"] for entry in manifest.values()}
+    for name in os.listdir(cache_dir):
+        # Only cached frames are named after a content hash, leave anything else
+        if CACHED_FRAME.fullmatch(name) and name not in referenced:
+            os.remove(os.path.join(cache_dir, name))
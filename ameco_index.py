@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+from ameco_cache import CACHE_DIR
+from keyword_matcher import KeywordMatcher
+from persist import read_pickle, write_pickle
+
+INDEX_NAME = "series_index.pickle"
+
+# Indexed metadata fields and the column holding them in the AMECO workbooks
+INDEX_FIELDS = {
+    "series": 0,
+    "country": 1,
+    "code": 6,
+    "title": 9,
+    "unit": 10,
+}
+
+# Fields looked up with their exact value, units must match exactly
+EXACT_FIELDS = ("unit",)
+
+# Part of the key of the persisted index, changed whenever the keys change
+INDEX_VERSION = 2
+
+
+def normalize_key(value, field: str = None) -> str:
+    # Keys are case-folded only: the query keywords rely on exact whitespace,
+    # e.g. the trailing space of "ESA 2010 "
+    if field in EXACT_FIELDS:
+        return str(value)
+    return str(value).casefold()
+
+
+def _index_key(excel_files: List[pd.DataFrame]) -> str | None:
+    # The index is valid as long as the workbooks have the same content and order
+    digests = [df.attrs.get("sha256") for df in excel_files]
+    if None in digests:
+        return None
+    return hashlib.sha256(
+        "\n".join([f"v{INDEX_VERSION}"] + digests).encode()
+    ).hexdigest()
+
+
+def build_index(excel_files: List[pd.DataFrame]) -> Dict:
+    """
+    Builds the series index of the AMECO workbooks.
+
+    Rows are addressed by their global position: the row number within the
+    workbook plus the offset of the workbook, the offsets following the order of
+    excel_files.
+
+    Args:
+        excel_files: DataFrames of the AMECO workbooks
+
+    Returns:
+        A dictionary with the workbook "offsets" and, for every indexed field, a
+        mapping from normalized value to the sorted positions of its rows
+    """
+    import numpy as np
+    import pandas as pd
+
+    offsets = np.cumsum([0] + [len(df) for df in excel_files])
+    index = {"key": _index_key(excel_files), "offsets": offsets}
+
+    for field, column in INDEX_FIELDS.items():
+        values = pd.concat(
+            [df.iloc[:, column] for df in excel_files], ignore_index=True
+        )
+        # Normalize the distinct values only, then group row positions by code
+        codes, uniques = pd.factorize(values)
+        keys = [normalize_key(value, field) for value in uniques]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+        postings = {}
+        for i, key in enumerate(keys):
+            positions = order[bounds[i] : bounds[i + 1]]
+            if key in postings:
+                positions = np.union1d(postings[key], positions)
+            postings[key] = positions
+        index[field] = postings
+
+    return index
+
+
+def load_index(excel_files: List[pd.DataFrame], cache_dir: str = CACHE_DIR) -> Dict:
+    """
+    Loads the series index from the cache, building and saving it if it is stale.
+
+    Frames that were not read through the workbook cache carry no fingerprint; their
+    index is built in memory and not persisted.
+
+    Args:
+        excel_files: DataFrames of the AMECO workbooks
+        cache_dir: Directory holding the cache
+
+    Returns:
+        The series index, see build_index
+    """
+    key = _index_key(excel_files)
+    index_path = os.path.join(cache_dir, INDEX_NAME)
+
+    if key is not None:
+        index = read_pickle(index_path)
+        if isinstance(index, dict) and index.get("key") == key:
+            return index
+
+    index = build_index(excel_files)
+    if key is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_pickle(index, index_path)
+    return index
+
+
+def find_keys(
+    index: Dict,
+    field: str,
+    keywords: List[str],
+    exclude_keywords: List[str] = [],
+    mode: str = "substring",
+) -> List[str]:
+    """
+    Returns the indexed values of a field matching any of the keywords.
+
+    Only the distinct values are scanned, never the rows.
+
+    Args:
+        index: The series index
+        field: Indexed field, e.g. "title"
+        keywords: Case-insensitive patterns, at least one must match
+        exclude_keywords: Case-insensitive patterns that must all fail to match
+        mode: "exact", "prefix" or "substring", see KeywordMatcher
+
+    Returns:
+        The matching normalized values
+    """
+    keys = list(index[field])
+    hits = KeywordMatcher(keywords + exclude_keywords, mode).match_values(keys)
+    selected = hits[:, : len(keywords)].any(axis=1)
+    selected &= ~hits[:, len(keywords) :].any(axis=1)
+    return [key for key, keep in zip(keys, selected) if keep]
+
+
+def lookup(index: Dict, **criteria) -> np.ndarray:
+    """
+    Returns the positions of the rows matching all the criteria.
+
+    Args:
+        index: The series index
+        **criteria: Indexed field names mapped to a value or a list of accepted
+            values, e.g. lookup(index, country="FRA", unit=["Mrd ECU/EUR"])
+
+    Returns:
+        The sorted global positions of the matching rows
+    """
+    import numpy as np
+
+    result = None
+    for field, values in criteria.items():
+        if isinstance(values, str):
+            values = [values]
+        postings = index[field]
+        keys = [normalize_key(value, field) for value in values]
+        matches = [postings[key] for key in keys if key in postings]
+        positions = (
+            np.unique(np.concatenate(matches)) if matches else np.array([], dtype=int)
+        )
+        result = positions if result is None else np.intersect1d(result, positions)
+    return result if result is not None else np.array([], dtype=int)
+
+
+def rows_by_file(
+    index: Dict, excel_files: List[pd.DataFrame], positions: np.ndarray
+) -> List[pd.DataFrame]:
+    """
+    Fetches the rows at the given positions, one DataFrame per workbook.
+
+    Args:
+        index: The series index
+        excel_files: DataFrames of the AMECO workbooks, in the order of the index
+        positions: Sorted global positions of the rows
+
+    Returns:
+        The non-empty row selections, in workbook order
+    """
+    import numpy as np
+
+    offsets = index["offsets"]
+    bounds = np.searchsorted(positions, offsets)
+    selections = []
+    for i, df in enumerate(excel_files):
+        rows = positions[bounds[i] : bounds[i + 1]] - offsets[i]
+        if len(rows):
+            selections.append(df.iloc[rows])
+    return selections
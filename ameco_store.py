@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Number of metadata columns (SERIES to UNIT.1) before the year columns
+METADATA_COLUMNS = 11
+
+
+@dataclass
+class SeriesStore:
+    """
+    Compact in-memory store of AMECO wide tables.
+
+    Each workbook keeps its own block of values over its own years, so a table
+    covering 1870-2022 does not widen the blocks of the workbooks starting in
+    1960.
+
+    Attributes:
+        metadata: One row per series, repeated text columns stored as categoricals
+        blocks: Contiguous series x year matrix of every workbook, NaN where a
+            value is missing
+        years: Year columns of every workbook, in the order of the workbook
+        offsets: Position of the first series of every workbook in metadata,
+            followed by the number of series
+        workbook_attrs: DataFrame.attrs of every source workbook
+        workbook_dtypes: Metadata column dtypes of every source workbook
+    """
+
+    metadata: pd.DataFrame
+    blocks: List[np.ndarray]
+    years: List[np.ndarray]
+    offsets: np.ndarray
+    workbook_attrs: List[dict] = field(default_factory=list)
+    workbook_dtypes: List[dict] = field(default_factory=list)
+
+    @classmethod
+    def from_frames(
+        cls, excel_files: List[pd.DataFrame], dtype="float32"
+    ) -> "SeriesStore":
+        """
+        Packs AMECO workbooks into a store.
+
+        Args:
+            excel_files: DataFrames of the AMECO workbooks
+            dtype: Value type. float32 halves the memory of the values but keeps
+                about 7 significant digits: the expanded values are rounded back
+                to the shortest decimal of the float32, which restores the
+                values written with 7 digits or less only. float64 keeps every
+                value exactly
+
+        Returns:
+            The SeriesStore holding all the series of excel_files
+        """
+        import numpy as np
+        import pandas as pd
+
+        blocks = [
+            np.ascontiguousarray(df.iloc[:, METADATA_COLUMNS:].to_numpy(dtype=dtype))
+            for df in excel_files
+        ]
+        years = [
+            np.array([int(y) for y in df.columns[METADATA_COLUMNS:]], dtype=np.int16)
+            for df in excel_files
+        ]
+        offsets = np.cumsum([0] + [len(df) for df in excel_files])
+
+        metadata = pd.concat(
+            [df.iloc[:, :METADATA_COLUMNS] for df in excel_files], ignore_index=True
+        )
+        for column in metadata.columns[1:]:
+            # Every column but SERIES repeats a handful of values over the rows
+            if not pd.api.types.is_numeric_dtype(metadata[column]):
+                metadata[column] = metadata[column].astype("category")
+
+        return cls(
+            metadata,
+            blocks,
+            years,
+            offsets,
+            [dict(df.attrs) for df in excel_files],
+            [df.dtypes.iloc[:METADATA_COLUMNS].to_dict() for df in excel_files],
+        )
+
+    @property
+    def missing(self) -> List[np.ndarray]:
+        import numpy as np
+
+        # NaN mask of the values of every workbook
+        return [np.isnan(block) for block in self.blocks]
+
+    @property
+    def nbytes(self) -> int:
+        # Memory held by the store
+        return int(self.metadata.memory_usage(deep=True).sum()) + sum(
+            block.nbytes for block in self.blocks
+        )
+
+    def select(self, positions: np.ndarray) -> "SeriesStore":
+        """
+        Returns a store holding only the series at the given positions.
+
+        Workbooks left without series are kept, empty, so that the store still
+        has one block per source workbook.
+
+        Args:
+            positions: Sorted positions of the series to keep, numbered across
+                the workbooks like the rows of the series index
+
+        Returns:
+            A new SeriesStore
+        """
+        import numpy as np
+
+        positions = np.asarray(positions, dtype=np.int64)
+        bounds = np.searchsorted(positions, self.offsets)
+        blocks = [
+            np.ascontiguousarray(
+                block[positions[bounds[i] : bounds[i + 1]] - self.offsets[i]]
+            )
+            for i, block in enumerate(self.blocks)
+        ]
+        return SeriesStore(
+            self.metadata.iloc[positions].reset_index(drop=True),
+            blocks,
+            self.years,
+            bounds - bounds[0],
+            self.workbook_attrs,
+            self.workbook_dtypes,
+        )
+
+    def _frame(self, i: int) -> pd.DataFrame:
+        import numpy as np
+        import pandas as pd
+
+        # Wide table of workbook i, with the columns and dtypes of the workbook
+        start, end = self.offsets[i], self.offsets[i + 1]
+        metadata = self.metadata.iloc[start:end].reset_index(drop=True)
+        for column in metadata.columns:
+            if isinstance(metadata[column].dtype, pd.CategoricalDtype):
+                # Only the categories of the workbook, e.g. none where its column
+                # was all NaN (float64)
+                metadata[column] = metadata[column].cat.remove_unused_categories()
+        metadata = metadata.astype(self.workbook_dtypes[i])
+        values = self.blocks[i]
+        if values.dtype != np.float64:
+            # Shortest decimal of each value, e.g. 463.7509 and not 463.75088...
+            values = values.astype(str).astype(np.float64)
+        df = pd.concat(
+            [
+                metadata,
+                pd.DataFrame(values, columns=self.years[i].tolist()),
+            ],
+            axis=1,
+        )
+        df.attrs = dict(self.workbook_attrs[i])
+        return df
+
+    def to_frames(self) -> List[pd.DataFrame]:
+        """
+        Expands the store into one wide table per source workbook.
+
+        The frames have the columns, dtypes and attrs of the workbooks, so they
+        can be passed to any function taking the list returned by
+        read_excel_files.
+
+        Returns:
+            The DataFrames of the workbooks, in their original order
+        """
+        return [self._frame(i) for i in range(len(self.blocks))]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Expands the store into one AMECO wide table with year columns in order.
+
+        Years missing from a workbook are NaN in its rows.
+
+        Returns:
+            A DataFrame with the metadata columns followed by one column per year
+        """
+        import pandas as pd
+
+        frames = self.to_frames()
+        years = sorted({int(y) for block_years in self.years for y in block_years})
+        df = pd.concat(frames, ignore_index=True)
+        return df[list(df.columns[:METADATA_COLUMNS]) + years]
+
+    def rows_by_file(self, positions: np.ndarray) -> List[pd.DataFrame]:
+        """
+        Expands the series at the given positions, one DataFrame per workbook.
+
+        Like ameco_index.rows_by_file, the frames are indexed by the row number of
+        the series in its workbook and keep the workbook attrs.
+
+        Args:
+            positions: Sorted positions of the series, numbered across the
+                workbooks like the rows of the series index
+
+        Returns:
+            The non-empty row selections, in workbook order
+        """
+        import numpy as np
+
+        positions = np.asarray(positions, dtype=np.int64)
+        bounds = np.searchsorted(positions, self.offsets)
+        selected = self.select(positions)
+        selections = []
+        for i in range(len(self.blocks)):
+            rows = positions[bounds[i] : bounds[i + 1]] - self.offsets[i]
+            if len(rows):
+                df = selected._frame(i)
+                df.index = rows
+                selections.append(df)
+        return selections
+
+    def metadata_frames(self) -> List[pd.DataFrame]:
+        """
+        Returns the metadata columns of every workbook, with the workbook attrs.
+
+        The frames index like the workbooks: ameco_index.load_index and
+        build_index accept them in place of the full tables.
+
+        Returns:
+            One DataFrame of metadata per workbook, in the original order
+        """
+        frames = []
+        for i, attrs in enumerate(self.workbook_attrs):
+            df = self.metadata.iloc[self.offsets[i] : self.offsets[i + 1]]
+            df = df.reset_index(drop=True)
+            df.attrs = dict(attrs)
+            frames.append(df)
+        return frames
@@ -0,0 +1,238 @@
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+QUOTE = b'"'
+
+# Read size of the streaming converters, the memory they use is a small multiple
+BUFFER_SIZE = 1 << 20
+
+
+def _translate_block(block, table, in_quotes, strip=None):
+    """
+    Translates the unquoted bytes of a block.
+
+    Blocks without a quote take the fast path, a single translate call. Other
+    blocks are split on quotes: segments alternate between outside and inside a
+    quoted field, escaped quotes ("") simply open and close an empty segment.
+
+    Args:
+        block (bytes): Block of a delimited file, read in binary mode
+        table (bytes): Translation table applied outside quoted fields
+        in_quotes (bool): Whether the block starts inside a quoted field
+        strip (re.Pattern): Bytes pattern removed outside quoted fields, before
+            the translation
+
+    Returns:
+        tuple: (translated block, whether the block ends inside a quoted field)
+    """
+    if QUOTE not in block:
+        if in_quotes:
+            return block, in_quotes
+        if strip is not None:
+            block = strip.sub(b"", block)
+        return block.translate(table), in_quotes
+
+    segments = block.split(QUOTE)
+    start = 1 if in_quotes else 0
+    for i in range(start, len(segments), 2):
+        if strip is not None:
+            segments[i] = strip.sub(b"", segments[i])
+        segments[i] = segments[i].translate(table)
+    # Every quote toggles the state, there are len(segments) - 1 of them
+    in_quotes ^= (len(segments) - 1) % 2 == 1
+    return QUOTE.join(segments), in_quotes
+
+
+def convert_delimiter(
+    input_file, output_file, delimiter=",", out_delimiter="\t", buffer_size=BUFFER_SIZE
+):
+    """
+    Streams a delimited file into another, replacing its field delimiter.
+
+    The file is processed in fixed-size binary buffers, so memory stays constant
+    whatever the size of the file. Delimiters inside quoted fields are kept, and
+    the quoting state is carried from one buffer to the next. The delimiters must
+    be single ASCII characters, which never occur inside a UTF-8 multi-byte
+    character, so the buffers can be cut anywhere.
+
+    Args:
+        input_file (str): Path of the delimited file
+        output_file (str): Path of the converted file
+        delimiter (str): Field delimiter of input_file
+        out_delimiter (str): Field delimiter of output_file
+        buffer_size (int): Number of bytes read at a time
+
+    Returns:
+        int: Number of bytes written
+    """
+    table = bytes.maketrans(delimiter.encode("ascii"), out_delimiter.encode("ascii"))
+
+    written = 0
+    in_quotes = False
+    with open(input_file, "rb") as infile, open(output_file, "wb") as outfile:
+        while True:
+            block = infile.read(buffer_size)
+            if not block:
+                break
+            block, in_quotes = _translate_block(block, table, in_quotes)
+            written += outfile.write(block)
+    return written
+
+
+def _byte(char, name):
+    # The converters work on raw bytes, so separators must be one ASCII character
+    if len(char) != 1 or not char.isascii():
+        raise ValueError(f"{name} must be a single ASCII character, got {char!r}")
+    return char.encode("ascii")
+
+
+def _thousands_pattern(thousands):
+    # A thousands separator sits between a digit and a group of exactly three
+    # digits, so the spaces of text fields are kept. Any character is accepted,
+    # e.g. the narrow no-break space (U+202F) of French exports, in UTF-8
+    if len(thousands) != 1:
+        raise ValueError(f"thousands must be a single character, got {thousands!r}")
+    separator = re.escape(thousands.encode("utf-8"))
+    return re.compile(rb"(?<=\d)" + separator + rb"(?=\d{3}(?!\d))")
+
+
+def _line_blocks(infile, buffer_size, length=None):
+    # Yield blocks of whole lines, so that no number is cut between two blocks;
+    # reads at most length bytes if given
+    tail = b""
+    while length is None or length > 0:
+        block = infile.read(buffer_size if length is None else min(buffer_size, length))
+        if not block:
+            break
+        if length is not None:
+            length -= len(block)
+        block = tail + block
+        end = block.rfind(b"\n") + 1
+        tail = block[end:]
+        if end:
+            yield block[:end]
+    if tail:
+        yield tail
+
+
+def _normalize_range(input_file, part_file, start, length, table, strip, in_quotes):
+    # Normalize length bytes of input_file from start into part_file
+    with open(input_file, "rb") as infile, open(part_file, "wb") as outfile:
+        infile.seek(start)
+        for block in _line_blocks(infile, BUFFER_SIZE, length):
+            block, in_quotes = _translate_block(block, table, in_quotes, strip)
+            outfile.write(block)
+
+
+def normalize_delimited(
+    input_file,
+    output_file,
+    delimiter=":",
+    out_delimiter=",",
+    decimal=",",
+    out_decimal=".",
+    thousands=None,
+    buffer_size=BUFFER_SIZE,
+    workers=1,
+    chunk_size=64 << 20,
+):
+    """
+    Streams a delimited file into another, normalizing delimiters and numbers.
+
+    All the replacements are done at once with a single translation table, so
+    swapping characters (e.g. "," for "." and ":" for ",") is safe. Quoted fields
+    are copied unchanged. The thousands separator is only removed between digits,
+    in front of a group of three digits: "1 234,5" becomes "1234.5" while the
+    spaces of "Produit interieur brut" are kept.
+
+    Args:
+        input_file (str): Path of the delimited file
+        output_file (str): Path of the normalized file
+        delimiter (str): Field delimiter of input_file
+        out_delimiter (str): Field delimiter of output_file
+        decimal (str): Decimal separator of input_file
+        out_decimal (str): Decimal separator of output_file
+        thousands (str): Thousands separator of input_file, removed, or None.
+            Any single character, e.g. "\u202f" or "\xa0", the file being UTF-8
+        buffer_size (int): Number of bytes read at a time
+        workers (int): Number of worker processes, None for the number of CPUs.
+            With more than one, the file is cut into chunks normalized in parallel
+        chunk_size (int): Size of the chunks of the parallel mode
+
+    Raises:
+        ValueError: If a separator is not a single ASCII character (any single
+            character for thousands), or the thousands separator is also the
+            delimiter or the decimal separator
+    """
+    source = _byte(delimiter, "delimiter") + _byte(decimal, "decimal")
+    target = _byte(out_delimiter, "out_delimiter") + _byte(out_decimal, "out_decimal")
+    strip = None
+    if thousands is not None:
+        strip = _thousands_pattern(thousands)
+        if thousands in (delimiter, decimal):
+            raise ValueError(
+                "thousands must differ from the delimiter and the decimal separator"
+            )
+    table = bytes.maketrans(source, target)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    size = os.path.getsize(input_file)
+    n_chunks = -(-size // chunk_size)
+    workers = max(1, min(workers, n_chunks))
+
+    if workers == 1:
+        in_quotes = False
+        with open(input_file, "rb") as infile, open(output_file, "wb") as outfile:
+            for block in _line_blocks(infile, buffer_size):
+                block, in_quotes = _translate_block(block, table, in_quotes, strip)
+                outfile.write(block)
+        return
+
+    # The chunks start after a line break, so that no number is cut between two
+    # chunks; counting the quotes before each chunk gives the quoting state it
+    # starts in
+    starts = [0]
+    with open(input_file, "rb") as infile:
+        for start in range(chunk_size, size, chunk_size):
+            infile.seek(max(start, starts[-1]))
+            infile.readline()
+            if infile.tell() < size:
+                starts.append(infile.tell())
+    lengths = [end - start for start, end in zip(starts, starts[1:] + [size])]
+    states = []
+    in_quotes = False
+    with open(input_file, "rb") as infile:
+        for length in lengths:
+            states.append(in_quotes)
+            in_quotes ^= infile.read(length).count(QUOTE) % 2 == 1
+
+    parts = [f"{output_file}.{os.getpid()}.{i}.part" for i in range(len(starts))]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _normalize_range,
+                    input_file,
+                    part,
+                    start,
+                    length,
+                    table,
+                    strip,
+                    state,
+                )
+                for part, start, length, state in zip(parts, starts, lengths, states)
+            ]
+            for future in futures:
+                future.result()
+
+        with open(output_file, "wb") as outfile:
+            for part in parts:
+                with open(part, "rb") as infile:
+                    shutil.copyfileobj(infile, outfile, buffer_size)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
@@ -1,10 +1,24 @@
-def transform(file_path):
-    # Open both input and output files
-    with open(file_path, "r") as input_file, open("dividends.csv", "w") as output_file:
-        for line in input_file:
-            # Write T4 lines to the output file
-            if "-T4," in line:
-                output_file.write(line)
+from period_filter import filter_periods
 
 
-transform("valeurs_trimestrielles.csv")
+def transform(file_path, output_csv="dividends.csv", quarters=(4,), indexed=False):
+    """
+    Extracts the values of some quarters of an INSEE quarterly series.
+
+    Args:
+        file_path (str): Path to the INSEE CSV file
+        output_csv (str): Path to the output CSV file
+        quarters (iterable): Quarters to keep, the fourth one by default
+        indexed (bool): Keep a period index next to the file, so that repeated
+            extractions do not rescan it
+    """
+    filter_periods(file_path, output_csv, quarters=quarters, indexed=indexed)
+
+
+def main():
+    # Keep the fourth quarter dividends
+    transform("valeurs_trimestrielles.csv")
+
+
+if __name__ == "__main__":
+    main()
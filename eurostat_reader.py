@@ -0,0 +1,156 @@
+import mmap
+
+from persist import INDEX_SUFFIX, load_sidecar
+
+
+def _delimiter_of(file_path):
+    return "," if file_path.lower().endswith(".csv") else "\t"
+
+
+def split_header(cells):
+    """
+    Splits the header cells of a Eurostat file into columns and key columns.
+
+    Bulk Eurostat files pack the key columns in the first cell, e.g.
+    "freq,unit,coicop,geo\\TIME_PERIOD", archived extracts have one column each.
+
+    Args:
+        cells (list): Header cells
+
+    Returns:
+        tuple: (columns, key_names, composite) where columns has the key columns
+        split out, and composite tells whether rows must be split with split_row
+    """
+    if "\\" in cells[0]:
+        key_names = cells[0].split("\\")[0].split(",")
+        return key_names + cells[1:], key_names, True
+    n_keys = next(
+        (i for i, cell in enumerate(cells) if cell.strip().isdigit()), len(cells)
+    )
+    return cells, cells[:n_keys], False
+
+
+def split_row(cells, composite):
+    # Split the composite key cell of a row like split_header does for the header
+    if composite:
+        return cells[0].split(",") + cells[1:]
+    return cells
+
+
+def build_row_index(file_path):
+    """
+    Indexes the lines of a Eurostat TSV dump by the values of its key columns.
+
+    The file is memory-mapped, line boundaries are found with one vectorized scan
+    for newlines, and only the key part of each line is decoded.
+
+    Args:
+        file_path (str): Path to the Eurostat TSV (or CSV) file
+
+    Returns:
+        dict: The header, the byte offsets of every data line ("starts", "ends")
+        and, in "keys", a mapping from key column to value to line numbers
+    """
+    import numpy as np
+
+    delimiter = _delimiter_of(file_path)
+
+    with open(file_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        newlines = np.flatnonzero(np.frombuffer(mm, dtype=np.uint8) == ord("\n"))
+        starts = np.concatenate([[0], newlines + 1])
+        ends = np.concatenate([newlines, [len(mm)]])
+
+        header = mm[starts[0] : ends[0]].decode("utf-8").rstrip("\r")
+        columns, key_names, composite = split_header(header.split(delimiter))
+
+        keep = []
+        keys = {name: {} for name in key_names}
+        encoded_delimiter = delimiter.encode()
+        for line_number in range(1, len(starts)):
+            start, end = starts[line_number], ends[line_number]
+            if end - start <= 1:
+                continue
+            if composite:
+                key_end = mm.find(encoded_delimiter, start, end)
+                key_cells = mm[start : end if key_end < 0 else key_end]
+                values = key_cells.decode("utf-8").rstrip("\r").split(",")
+            else:
+                line = mm[start:end].decode("utf-8").rstrip("\r")
+                values = line.split(delimiter, len(key_names))[: len(key_names)]
+
+            row = len(keep)
+            keep.append(line_number)
+            for name, value in zip(key_names, values):
+                keys[name].setdefault(value, []).append(row)
+
+    keep = np.array(keep, dtype=np.int64)
+    return {
+        "columns": columns,
+        "composite": composite,
+        "starts": starts[keep],
+        "ends": ends[keep],
+        "keys": {
+            name: {value: np.array(rows) for value, rows in postings.items()}
+            for name, postings in keys.items()
+        },
+    }
+
+
+def load_row_index(file_path):
+    """
+    Loads the row index of a Eurostat dump from its .idx sidecar.
+
+    Args:
+        file_path (str): Path to the Eurostat TSV (or CSV) file
+
+    Returns:
+        dict: The row index, see build_row_index and persist.load_sidecar
+    """
+    return load_sidecar(file_path, INDEX_SUFFIX, lambda: build_row_index(file_path))
+
+
+def read_rows(file_path, index=None, **criteria):
+    """
+    Reads the lines of a Eurostat dump whose key columns match the criteria.
+
+    Only the matching lines are touched, through the memory map of the file.
+
+    Args:
+        file_path (str): Path to the Eurostat TSV (or CSV) file
+        index (dict): Row index of the file, loaded from its sidecar if not given
+        **criteria: Key columns mapped to a value or a list of accepted values,
+            e.g. read_rows("prc_hicp_midx.tsv", geo="FR", unit="I15")
+
+    Returns:
+        tuple: (columns, rows) where columns are the names of the columns, the key
+        columns split out of a composite first cell, and rows the matching lines
+        split into cells the same way, in file order
+    """
+    import numpy as np
+
+    if index is None:
+        index = load_row_index(file_path)
+
+    selected = None
+    for name, values in criteria.items():
+        if isinstance(values, str):
+            values = [values]
+        postings = index["keys"][name]
+        matches = [postings[value] for value in values if value in postings]
+        rows = np.unique(np.concatenate(matches)) if matches else np.array([], int)
+        selected = rows if selected is None else np.intersect1d(selected, rows)
+    if selected is None:
+        selected = np.arange(len(index["starts"]))
+
+    delimiter = _delimiter_of(file_path)
+    rows = []
+    with open(file_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        for row in selected:
+            line = mm[index["starts"][row] : index["ends"][row]]
+            line = line.decode("utf-8").rstrip("\r")
+            rows.append(split_row(line.split(delimiter), index["composite"]))
+    return index["columns"], rows
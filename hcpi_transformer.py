@@ -1,221 +1,409 @@
-def transform(file_path, years, output_csv=None):
-    coicop_descriptions = {
-        "CP01": "Food and non-alcoholic beverages",
-        "CP02": "Alcoholic beverages and tobacco",
-        "CP03": "Clothing and footwear",
-        "CP04": "Housing, water, electricity, gas and other fuels",
-        "CP05": "Household furnishings/equipment/maintenance",
-        "CP06": "Health",
-        "CP07": "Transport",
-        "CP08": "Communication",
-        "CP09": "Recreation and culture",
-        "CP10": "Education",
-        "CP11": "Restaurants and hotels",
-        "CP12": "Miscellaneous goods and services",
-    }
-
-    # Add list to store results if output_csv is specified
-    results = []
+import csv
+import sys
+
+from delimited import BUFFER_SIZE, convert_delimiter
+from eurostat_reader import read_rows, split_header, split_row
+
+COICOP_DESCRIPTIONS = {
+    "CP01": "Food and non-alcoholic beverages",
+    "CP02": "Alcoholic beverages and tobacco",
+    "CP03": "Clothing and footwear",
+    "CP04": "Housing, water, electricity, gas and other fuels",
+    "CP05": "Household furnishings/equipment/maintenance",
+    "CP06": "Health",
+    "CP07": "Transport",
+    "CP08": "Communication",
+    "CP09": "Recreation and culture",
+    "CP10": "Education",
+    "CP11": "Restaurants and hotels",
+    "CP12": "Miscellaneous goods and services",
+}
+
+
+# Eurostat observation flags, each one is a bit of the flag bitmasks
+EUROSTAT_FLAGS = "bcdefnprsuz"
+FLAG_BITS = {flag: 1 << i for i, flag in enumerate(EUROSTAT_FLAGS)}
+
+# A cell is a number or ":" (missing), optionally followed by Eurostat flags
+CELL_PATTERN = (
+    r"^\s*(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)|:)?\s*"
+    rf"(?P<flags>[{EUROSTAT_FLAGS}]*)\s*$"
+)
 
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            import csv
 
-            delimiter = "," if file_path.lower().endswith(".csv") else "\t"
-            reader = csv.reader(file, delimiter=delimiter)
+def _flag_masks(flag_strings):
+    import numpy as np
 
-            # Get header row and find indices
-            header = next(reader)
-            try:
-                geo_index = header.index("geo")
-                coicop_index = header.index("coicop")
-                year_indices = {
-                    year: header.index(f"{year} ") for year in years
-                }  # Note the space after year
-            except ValueError:
-                print(
-                    f"Error: One or more years not found in file. Available years may be missing."
-                )
-                return
+    # Bitmask of every distinct flag string, followed by the empty mask of the
+    # cells that do not parse
+    masks = [sum(FLAG_BITS[flag] for flag in set(s)) for s in flag_strings]
+    return np.array(masks + [0], dtype=np.uint16)
 
-            # Calculate total width needed for years columns
-            year_column_width = 12 * len(years)
 
-            # Print header
-            print("\n+" + "-" * 60 + "+" + "-" * year_column_width + "+")
-            years_header = "".join(f" | {year:>10}" for year in years)
-            print(f"| {'Category and Description':<58}{years_header} |")
-            print("+" + "=" * 60 + "+" + ("=" * 12) * len(years) + "+")
+def _parse_cells_pyarrow(cells):
+    import pyarrow as pa
+    import pyarrow.compute as pc
 
-            # Read and process rows
-            sums = {year: 0 for year in years}
-            for row in reader:
-                if (
-                    row
-                    and row[geo_index] == "FR"
-                    and "CP" in row[coicop_index]
-                    and "CP00" not in row[coicop_index]
-                    and len(row[coicop_index]) == 4
-                ):
-                    coicop_code = row[coicop_index].strip()
-                    category_num = coicop_code[2:]
-                    description = coicop_descriptions.get(coicop_code, coicop_code)
-                    formatted_description = f"{category_num}. {description}"
-
-                    # Get values for all years
-                    values = []
-                    for year in years:
-                        value = row[year_indices[year]].strip()
-                        values.append(value)
-                        if value != ":" and value.strip():
-                            try:
-                                sums[year] += float(value)
-                            except ValueError:
-                                pass
-
-                    # Print row with all years
-                    values_str = "".join(f" | {val:>10}" for val in values)
-                    print(f"| {formatted_description:<58}{values_str} |")
-                    print("+" + "-" * 60 + "+" + ("-" * 12) * len(years) + "+")
-
-                    # Store results if output_csv specified
-                    if output_csv:
-                        result_row = {
-                            "category": coicop_code,
-                            "description": description,
-                        }
-                        for year, value in zip(years, values):
-                            result_row[str(year)] = value
-                        results.append(result_row)
-
-            # Print sums for all years
-            print("\nSums:")
-            for year in years:
-                print(f"{year}: {sums[year]:.2f}")
-
-            # Write results to CSV if output path specified
-            if output_csv and results:
-                import pandas as pd
-
-                df = pd.DataFrame(results)
-                df.to_csv(output_csv, index=False)
-                print(f"\nResults written to {output_csv}")
+    # Regex and number parsing run in the Arrow string kernels, cells that do not
+    # match are null
+    parts = pc.extract_regex(pa.array(cells, pa.string()), CELL_PATTERN)
+    number = pc.struct_field(parts, "value")
+    number = pc.if_else(
+        pc.is_in(number, pa.array([":", ""])), pa.scalar(None, pa.string()), number
+    )
+    values = pc.cast(number, pa.float64()).to_numpy(zero_copy_only=False)
 
-    except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found")
-    except Exception as e:
-        print(f"Error reading file: {str(e)}")
+    flags = pc.dictionary_encode(pc.fill_null(pc.struct_field(parts, "flags"), ""))
+    masks = _flag_masks(flags.dictionary.to_pylist())
+    return values, masks[flags.indices.to_numpy()]
 
 
-def transform_category(file_path, category, years, output_csv=None):
-    # Validate category format
-    if not category.startswith("CP") or len(category) != 4:
-        print("Error: Category must be in format 'CPxx' (e.g., 'CP12')")
-        return
+def _parse_cells_pandas(cells):
+    import pandas as pd
 
-    # Add list to store results if output_csv is specified
-    results = []
+    parts = pd.Series(cells, dtype=object).str.extract(CELL_PATTERN)
+    number = parts["value"]
+    values = pd.to_numeric(number.where(number != ":"), errors="coerce")
+
+    # Cells that do not parse have code -1 and get the trailing empty mask
+    flag_codes, flag_strings = pd.factorize(parts["flags"].fillna(""))
+    return values.to_numpy(dtype=float), _flag_masks(list(flag_strings))[flag_codes]
 
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            import csv
 
-            delimiter = "," if file_path.lower().endswith(".csv") else "\t"
-            reader = csv.reader(file, delimiter=delimiter)
+def parse_eurostat_values(cells, n_columns=None):
+    """
+    Splits Eurostat cells such as "261.37 e", ": " or ": c" into values and flags.
 
-            # Get header row and find indices
-            header = next(reader)
+    All the cells are parsed in one vectorized pass over the flattened cells: the
+    regex extraction and the numeric conversion run in the pyarrow string kernels
+    when pyarrow is installed, in pandas otherwise, and the flag strings are
+    converted to bitmasks once per distinct string.
+
+    Args:
+        cells: 2D sequence of cell strings
+        n_columns (int): Number of columns, needed when cells may be empty
+
+    Returns:
+        tuple: (values, flags) where values is a float matrix, NaN for missing or
+        unparsable cells, and flags a uint16 matrix with the FLAG_BITS of the flags
+        of each cell
+    """
+    import numpy as np
+
+    cells = np.asarray(cells, dtype=object)
+    if cells.size == 0:
+        shape = (len(cells), n_columns or 0)
+        return np.full(shape, np.nan), np.zeros(shape, dtype=np.uint16)
+
+    try:
+        values, flags = _parse_cells_pyarrow(cells.ravel())
+    except ImportError:
+        values, flags = _parse_cells_pandas(cells.ravel())
+    return values.reshape(cells.shape), flags.reshape(cells.shape)
+
+
+def decode_flags(mask):
+    """
+    Converts a flag bitmask back to its flag letters.
+
+    Args:
+        mask (int): Bitmask from the flags matrix of parse_eurostat_values
+
+    Returns:
+        str: The flag letters, e.g. "ep"
+    """
+    return "".join(flag for flag, bit in FLAG_BITS.items() if mask & bit)
+
+
+def _bucket_of(coicop):
+    # Bucket category of a COICOP code: None for the 12 top-level categories
+    # (CP01 to CP12), the parent category for their subcategories (e.g. CP121)
+    if not coicop.startswith("CP"):
+        return False
+    if len(coicop) == 4 and coicop != "CP00":
+        return None
+    if len(coicop) == 5:
+        return coicop[:4]
+    return False
+
+
+def transform_many(file_path, years, buckets, output_pattern=None, indexed=False):
+    """
+    Extracts many (country, category) breakdowns from a Eurostat HICP file at once.
+
+    The file is streamed once and every row is routed to the buckets that want it,
+    so memory is bounded by the size of the outputs rather than of the input.
+
+    Args:
+        file_path (str): Path to the Eurostat TSV (or CSV) file
+        years (iterable): Years to extract
+        buckets (list): Tuples (geo, category). A category of None extracts the 12
+            top-level categories of the country, as transform does, a category
+            "CPxx" extracts its subcategories, as transform_category does
+        output_pattern (str): If given, every bucket is written to a CSV file named
+            by formatting the pattern with geo and category, e.g.
+            "hcpi_{geo}_{category}.csv" (category is "all" for top-level buckets)
+        indexed (bool): Read only the lines of the requested countries through the
+            sidecar row index of the file (see eurostat_reader), built on first use
+
+    Returns:
+        dict: (geo, category) -> {"rows": list of result rows with the raw cells,
+        "values": float matrix of the rows x years values, "flags": matching
+        matrix of flag bitmasks (see parse_eurostat_values), "sums": dict of the
+        per-year sums}, or None if the file could not be read
+    """
+    import numpy as np
+
+    years = list(years)
+    for geo, category in buckets:
+        if category is not None and (
+            not category.startswith("CP") or len(category) != 4
+        ):
+            print("Error: Category must be in format 'CPxx' (e.g., 'CP12')")
+            return
+
+    results = {(geo, category): {"rows": []} for geo, category in buckets}
+
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            if indexed:
+                # Only read the lines of the requested countries
+                geos = sorted({geo for geo, _ in buckets})
+                header, reader = read_rows(file_path, geo=geos)
+            else:
+                delimiter = "," if file_path.lower().endswith(".csv") else "\t"
+                reader = csv.reader(file, delimiter=delimiter)
+
+                # Get header row, with the key columns of bulk files split out
+                header, _, composite = split_header(next(reader))
+                if composite:
+                    reader = (split_row(row, composite) for row in reader if row)
+
+            # Find indices
             try:
                 geo_index = header.index("geo")
                 coicop_index = header.index("coicop")
-                year_indices = {year: header.index(f"{year} ") for year in years}
+                year_indices = {
+                    year: header.index(f"{year} ") for year in years
+                }  # Note the space after year
             except ValueError:
                 print(
                     f"Error: One or more years not found in file. Available years may be missing."
                 )
                 return
 
-            # Calculate total width needed for years columns
-            year_column_width = 12 * len(years)
-
-            # Print header
-            print(f"\nBreakdown for category {category}:")
-            print("+" + "-" * 60 + "+" + "-" * year_column_width + "+")
-            years_header = "".join(f" | {year:>10}" for year in years)
-            print(f"| {'Subcategory':<58}{years_header} |")
-            print("+" + "=" * 60 + "+" + ("=" * 12) * len(years) + "+")
-
-            # Read and process rows
-            sums = {year: 0 for year in years}
+            # Read the file once, routing each row to its bucket
             for row in reader:
-                if (
-                    row
-                    and row[geo_index] == "FR"
-                    and row[coicop_index].startswith(category)
-                    and len(row[coicop_index]) == 5
-                ):
-                    coicop_code = row[coicop_index].strip()
-                    subcategory = f"{coicop_code[2:4]}.{coicop_code[4]}"
-
-                    # Get values for all years
-                    values = []
-                    for year in years:
-                        value = row[year_indices[year]].strip()
-                        values.append(value)
-                        if value != ":" and value.strip():
-                            try:
-                                sums[year] += float(value)
-                            except ValueError:
-                                pass
-
-                    # Print row with all years
-                    values_str = "".join(f" | {val:>10}" for val in values)
-                    print(f"| {subcategory:<58}{values_str} |")
-                    print("+" + "-" * 60 + "+" + ("-" * 12) * len(years) + "+")
-
-                    # Store results if output_csv specified
-                    if output_csv:
-                        result_row = {
-                            "subcategory": coicop_code,
-                            "description": subcategory,
-                        }
-                        for year, value in zip(years, values):
-                            result_row[str(year)] = value
-                        results.append(result_row)
-
-            # Print sums for all years
-            print("\nSums:")
-            for year in years:
-                print(f"{year}: {sums[year]:.2f}")
-
-            # Write results to CSV if output path specified
-            if output_csv and results:
-                import pandas as pd
-
-                df = pd.DataFrame(results)
-                df.to_csv(output_csv, index=False)
-                print(f"\nResults written to {output_csv}")
+                if not row:
+                    continue
+                bucket = results.get((row[geo_index], _bucket_of(row[coicop_index])))
+                if bucket is None:
+                    continue
+
+                coicop_code = row[coicop_index].strip()
+                if len(coicop_code) == 4:
+                    result_row = {
+                        "category": coicop_code,
+                        "description": COICOP_DESCRIPTIONS.get(
+                            coicop_code, coicop_code
+                        ),
+                    }
+                else:
+                    result_row = {
+                        "subcategory": coicop_code,
+                        "description": f"{coicop_code[2:4]}.{coicop_code[4]}",
+                    }
+
+                # Get the raw cells for all years, they are parsed in bulk below
+                for year in years:
+                    result_row[str(year)] = row[year_indices[year]].strip()
+                bucket["rows"].append(result_row)
 
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found")
+        return
     except Exception as e:
         print(f"Error reading file: {str(e)}")
+        return
 
+    # Parse the cells of all buckets at once, flagged values included
+    cells = [
+        [row[str(year)] for year in years]
+        for bucket in results.values()
+        for row in bucket["rows"]
+    ]
+    values, flags = parse_eurostat_values(cells, len(years))
+    start = 0
+    for bucket in results.values():
+        end = start + len(bucket["rows"])
+        bucket["values"] = values[start:end]
+        bucket["flags"] = flags[start:end]
+        sums = np.nansum(bucket["values"], axis=0)
+        bucket["sums"] = {year: float(total) for year, total in zip(years, sums)}
+        start = end
+
+    # Write every bucket to its own CSV if an output pattern is specified
+    if output_pattern:
+        import pandas as pd
+
+        for (geo, category), bucket in results.items():
+            if bucket["rows"]:
+                output_csv = output_pattern.format(geo=geo, category=category or "all")
+                pd.DataFrame(bucket["rows"]).to_csv(output_csv, index=False)
+                print(f"Results written to {output_csv}")
+
+    return results
+
+
+def render_table(title, first_column, labels, rows, sums, years):
+    """
+    Renders a bucket as an ASCII table followed by the per-year sums.
+
+    The whole table is built in memory so it can be written in one call.
+
+    Args:
+        title (str): Line printed above the table, or None
+        first_column (str): Header of the label column
+        labels (list): Label of each row
+        rows (list): Result rows holding the raw cells under str(year)
+        sums (dict): Per-year sums
+        years (list): Years to render
+
+    Returns:
+        str: The rendered table
+    """
+    year_column_width = 12 * len(years)
+    separator = "+" + "-" * 60 + "+" + ("-" * 12) * len(years) + "+"
+
+    lines = [""]
+    if title:
+        lines.append(title)
+    lines.append("+" + "-" * 60 + "+" + "-" * year_column_width + "+")
+    years_header = "".join(f" | {year:>10}" for year in years)
+    lines.append(f"| {first_column:<58}{years_header} |")
+    lines.append("+" + "=" * 60 + "+" + ("=" * 12) * len(years) + "+")
+
+    for label, row in zip(labels, rows):
+        values_str = "".join(f" | {row[str(year)]:>10}" for year in years)
+        lines.append(f"| {label:<58}{values_str} |")
+        lines.append(separator)
+
+    lines.append("")
+    lines.append("Sums:")
+    lines.extend(f"{year}: {sums[year]:.2f}" for year in years)
+    return "\n".join(lines) + "\n"
+
+
+def _write_rows(rows, output_csv, render):
+    # Write results to CSV if output path specified
+    if output_csv and rows:
+        import pandas as pd
+
+        df = pd.DataFrame(rows)
+        df.to_csv(output_csv, index=False)
+        if render:
+            print(f"\nResults written to {output_csv}")
+
+
+def transform(file_path, years, output_csv=None, geo="FR", render=True):
+    """
+    Extracts the 12 top-level HICP categories of a country.
+
+    Args:
+        file_path (str): Path to the Eurostat TSV (or CSV) file
+        years (iterable): Years to extract
+        output_csv (str): If given, the result rows are written to this CSV file
+        geo (str): Country code
+        render (bool): Print the result as a table, False for batch runs
+
+    Returns:
+        dict: The bucket of the country, see transform_many
+    """
+    years = list(years)
+    results = transform_many(file_path, years, [(geo, None)])
+    if results is None:
+        return
+    bucket = results[(geo, None)]
+
+    if render:
+        labels = [
+            f"{row['category'][2:]}. {row['description']}" for row in bucket["rows"]
+        ]
+        sys.stdout.write(
+            render_table(
+                None,
+                "Category and Description",
+                labels,
+                bucket["rows"],
+                bucket["sums"],
+                years,
+            )
+        )
+    _write_rows(bucket["rows"], output_csv, render)
+    return bucket
+
+
+def transform_category(
+    file_path, category, years, output_csv=None, geo="FR", render=True
+):
+    """
+    Extracts the subcategories of one HICP category of a country.
+
+    Args:
+        file_path (str): Path to the Eurostat TSV (or CSV) file
+        category (str): Category in format "CPxx"
+        years (iterable): Years to extract
+        output_csv (str): If given, the result rows are written to this CSV file
+        geo (str): Country code
+        render (bool): Print the result as a table, False for batch runs
+
+    Returns:
+        dict: The bucket of the category, see transform_many
+    """
+    # Validate category format
+    if not category.startswith("CP") or len(category) != 4:
+        print("Error: Category must be in format 'CPxx' (e.g., 'CP12')")
+        return
 
-def convert_to_tsv(input_file, output_file=None):
+    years = list(years)
+    results = transform_many(file_path, years, [(geo, category)])
+    if results is None:
+        return
+    bucket = results[(geo, category)]
+
+    if render:
+        sys.stdout.write(
+            render_table(
+                f"Breakdown for category {category}:",
+                "Subcategory",
+                [row["description"] for row in bucket["rows"]],
+                bucket["rows"],
+                bucket["sums"],
+                years,
+            )
+        )
+    _write_rows(bucket["rows"], output_csv, render)
+    return bucket
+
+
+def convert_to_tsv(input_file, output_file=None, buffer_size=BUFFER_SIZE):
+    """
+    Converts a CSV file to TSV, streaming it in fixed-size buffers.
+
+    Commas inside quoted fields, e.g. in the AMECO "SUB-CHAPTER" column, are kept.
+
+    Args:
+        input_file (str): Path to the CSV file
+        output_file (str): Path to the TSV file, input_file with a .tsv extension
+            if not given
+        buffer_size (int): Number of bytes read at a time
+    """
     if output_file is None:
         # If no output file specified, create name by replacing .csv with .tsv
         output_file = input_file.replace(".csv", ".tsv")
 
     try:
-        with open(input_file, "r", encoding="utf-8") as infile:
-            content = infile.read()
-            # Replace commas with tabs
-            converted_content = content.replace(",", "\t")
-
-        with open(output_file, "w", encoding="utf-8") as outfile:
-            outfile.write(converted_content)
-
+        convert_delimiter(input_file, output_file, ",", "\t", buffer_size)
         print(f"Successfully converted {input_file} to {output_file}")
 
     except FileNotFoundError:
@@ -224,12 +412,17 @@ def convert_to_tsv(input_file, output_file=None):
         print(f"Error processing file: {str(e)}")
 
 
-# Example usage:
-# transform("estat_prc_hicp_aind.tsv", range(1996, 2023), "hcpi_indexes.csv")
-transform_category(
-    "estat_prc_hicp_inw.tsv",
-    "CP12",
-    range(1996, 2024),
-    "hcpi_miscellaneous_weights.csv",
-)
-# convert_to_tsv("estat_prc_hicp_aind.tsv")
+def main():
+    # Extract the French miscellaneous goods and services weights
+    # transform("estat_prc_hicp_aind.tsv", range(1996, 2023), "hcpi_indexes.csv")
+    transform_category(
+        "estat_prc_hicp_inw.tsv",
+        "CP12",
+        range(1996, 2024),
+        "hcpi_miscellaneous_weights.csv",
+    )
+    # convert_to_tsv("estat_prc_hicp_aind.tsv")
+
+
+if __name__ == "__main__":
+    main()
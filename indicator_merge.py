@@ -0,0 +1,169 @@
+KEY_COLUMNS = ["Entity", "Code", "Year"]
+COMBINE_RULES = ("mean", "sum")
+
+
+def _read_source(source):
+    import pandas as pd
+
+    # A source is a path or a DataFrame, optionally paired with its value column;
+    # by default the value column is the first column that is not a key
+    source, column = source if isinstance(source, tuple) else (source, None)
+    df = pd.read_csv(source) if isinstance(source, str) else source
+    if column is None:
+        column = next(c for c in df.columns if c not in KEY_COLUMNS)
+    return df, column
+
+
+def missing_report(merged, names):
+    """
+    Lists the rows of a merge that miss some of the indicators.
+
+    Args:
+        merged (pd.DataFrame): Wide merge, see merge_indicators
+        names (list): Indicator columns to check
+
+    Returns:
+        pd.DataFrame: Entity, Code, Year and Indicator of every missing value,
+        grouped by indicator
+    """
+    import numpy as np
+
+    values = merged[names].to_numpy(dtype=float)
+    columns, rows = np.nonzero(np.isnan(values).T)
+    report = merged.iloc[rows][KEY_COLUMNS].reset_index(drop=True)
+    report["Indicator"] = np.asarray(names, dtype=object)[columns]
+    return report
+
+
+def merge_indicators(
+    sources,
+    output_csv=None,
+    combine=None,
+    weights=None,
+    output_column="Value",
+    skipna=False,
+    report=True,
+):
+    """
+    Merges any number of OWID-style (Entity, Code, Year, value) indicators.
+
+    The (Entity, Code) pairs of all the sources are coded together as sorted
+    categories, so every row gets one integer key; the union of the keys is
+    sorted once and each source is placed in its column of the value matrix with
+    a binary search. Each source must have at most one value per key.
+
+    Args:
+        sources (dict): Indicator name mapped to a path, a DataFrame, or a
+            (path or DataFrame, value column) tuple
+        output_csv (str): If given, the result is written to this CSV file
+        combine (str): None keeps one column per indicator, "mean" or "sum"
+            combine them into output_column
+        weights (dict): Weighted mean instead: indicator name mapped to a number
+            or to the name of another indicator holding row weights, e.g.
+            {"women": "women_population", "men": "men_population"}. Indicators
+            used as weights are not combined
+        output_column (str): Name of the combined column
+        skipna (bool): Combine the available values only, instead of giving NaN
+            as soon as one indicator is missing
+        report (bool): Print the rows missing some indicator
+
+    Returns:
+        pd.DataFrame: The merged data, sorted by Entity, Code and Year
+
+    Raises:
+        ValueError: If combine is unknown
+    """
+    import numpy as np
+    import pandas as pd
+
+    if combine is not None and combine not in COMBINE_RULES:
+        raise ValueError(f"Unknown combination {combine!r}, expected {COMBINE_RULES}")
+
+    names = list(sources)
+    frames = []
+    for name in names:
+        df, column = _read_source(sources[name])
+        frames.append((df[KEY_COLUMNS], df[column].to_numpy(dtype=float)))
+
+    # One integer key per (Entity, Code, Year)
+    keys = pd.concat([key for key, _ in frames], ignore_index=True)
+    pairs, uniques = pd.MultiIndex.from_frame(keys[["Entity", "Code"]]).factorize(
+        sort=True
+    )
+    years = keys["Year"].to_numpy(dtype=np.int64)
+    first_year = years.min() if len(years) else 0
+    span = (years.max() - first_year + 1) if len(years) else 1
+    row_keys = pairs.astype(np.int64) * span + (years - first_year)
+    merged_keys = np.unique(row_keys)
+
+    # Sort-merge every source into its column of the value matrix
+    values = np.full((len(merged_keys), len(names)), np.nan)
+    start = 0
+    for i, (key, column_values) in enumerate(frames):
+        positions = np.searchsorted(merged_keys, row_keys[start : start + len(key)])
+        values[positions, i] = column_values
+        start += len(key)
+
+    entity_codes = uniques[merged_keys // span]
+    merged = pd.DataFrame(
+        {
+            "Entity": entity_codes.get_level_values(0),
+            "Code": entity_codes.get_level_values(1),
+            "Year": merged_keys % span + first_year,
+        }
+    )
+    for i, name in enumerate(names):
+        merged[name] = values[:, i]
+
+    if report:
+        lines = []
+        missing = missing_report(merged, names)
+        for name, rows in missing.groupby("Indicator", sort=False):
+            source = sources[name]
+            source = source[0] if isinstance(source, tuple) else source
+            label = source if isinstance(source, str) else name
+            lines.append(f"\nMissing {name} data:")
+            lines.extend(
+                "Year: "
+                + rows["Year"].astype(str)
+                + ", Country: "
+                + rows["Entity"].astype(str)
+                + f", File: {label}"
+            )
+        if lines:
+            print("\n".join(lines))
+
+    if weights is not None:
+        combined_names = list(weights)
+        v = merged[combined_names].to_numpy(dtype=float)
+        w = np.column_stack(
+            [
+                (
+                    merged[weight].to_numpy(dtype=float)
+                    if isinstance(weight, str)
+                    else np.full(len(merged), float(weight))
+                )
+                for weight in weights.values()
+            ]
+        )
+        if skipna:
+            w = np.where(np.isnan(v), 0.0, w)
+            v = np.where(np.isnan(v), 0.0, v)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            combined = (v * w).sum(axis=1) / w.sum(axis=1)
+        merged = merged[KEY_COLUMNS].assign(**{output_column: combined})
+    elif combine is not None:
+        available = ~np.isnan(values)
+        if skipna:
+            total = np.where(available, values, 0.0).sum(axis=1)
+            count = available.sum(axis=1)
+            total[count == 0] = np.nan
+        else:
+            total, count = values.sum(axis=1), len(names)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            combined = total / count if combine == "mean" else total
+        merged = merged[KEY_COLUMNS].assign(**{output_column: combined})
+
+    if output_csv:
+        merged.to_csv(output_csv, index=False)
+    return merged
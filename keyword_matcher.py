@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import TYPE_CHECKING, Iterable, List, Set
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MATCH_MODES = ("exact", "prefix", "substring")
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive multi-pattern matcher compiled once for a list of keywords.
+
+    Modes:
+        exact: the text equals a pattern, ignoring surrounding whitespace
+        prefix: the text starts with a pattern
+        substring: the text contains a pattern (Aho-Corasick automaton)
+
+    Each text is scanned once whatever the number of patterns.
+    """
+
+    def __init__(self, patterns: List[str], mode: str = "substring"):
+        if mode not in MATCH_MODES:
+            raise ValueError(
+                f"Unknown match mode {mode!r}, expected one of {MATCH_MODES}"
+            )
+        self.patterns = list(patterns)
+        self.mode = mode
+
+        if mode == "exact":
+            self._exact = {}
+            for i, pattern in enumerate(self.patterns):
+                self._exact.setdefault(pattern.strip().casefold(), set()).add(i)
+            return
+
+        # Trie of the patterns: one dict of transitions and one output set per node
+        self._goto = [{}]
+        self._output = [set()]
+        for i, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern.casefold():
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._output.append(set())
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].add(i)
+
+        if mode == "substring":
+            self._build_failure_links()
+
+    def _build_failure_links(self):
+        # Breadth-first, so the failure target of a node is always resolved first
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] |= self._output[self._fail[child]]
+
+    def match(self, text: str) -> Set[int]:
+        """
+        Returns the indices of the patterns matching the text.
+
+        Args:
+            text: Text to match
+
+        Returns:
+            The set of matching pattern indices
+        """
+        text = text.casefold()
+        if self.mode == "exact":
+            return set(self._exact.get(text.strip(), ()))
+
+        found = set()
+        node = 0
+        for char in text:
+            if self.mode == "prefix":
+                node = self._goto[node].get(char)
+                if node is None:
+                    break
+            else:
+                while node and char not in self._goto[node]:
+                    node = self._fail[node]
+                node = self._goto[node].get(char, 0)
+            found |= self._output[node]
+        return found
+
+    def match_values(self, values: Iterable) -> np.ndarray:
+        """
+        Matches many values, typically the distinct values of a column.
+
+        Missing (non-string) values match nothing. The result can be broadcast to
+        the rows of the column with the codes of pd.factorize.
+
+        Args:
+            values: Values to match
+
+        Returns:
+            A boolean matrix with one row per value and one column per pattern
+        """
+        import numpy as np
+
+        values = list(values)
+        hits = np.zeros((len(values), len(self.patterns)), dtype=bool)
+        for row, value in enumerate(values):
+            if isinstance(value, str):
+                hits[row, list(self.match(value))] = True
+        return hits
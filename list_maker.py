@@ -1,4 +1,3 @@
-import numpy as np
 import csv
 
 
@@ -11,6 +10,8 @@ def interpolate_csv_values(input_file, output_file):
         input_file (str): Path to input CSV file
         output_file (str): Path to output CSV file
     """
+    import numpy as np
+
     # Read the original values
     values = []
     with open(input_file, "r") as f:
@@ -98,7 +99,12 @@ def reverse_csv_columns(input_file, output_file):
     print(f"Successfully created column-reversed CSV in {output_file}")
 
 
-# Example usage
-# interpolate_csv_values("list.csv", "list_interpolated.csv")
-# reverse_csv_values("list.csv", "list_reversed.csv")
-reverse_csv_columns("table.csv", "table_columns_reversed.csv")
+def main():
+    # Reverse the columns of the table
+    # interpolate_csv_values("list.csv", "list_interpolated.csv")
+    # reverse_csv_values("list.csv", "list_reversed.csv")
+    reverse_csv_columns("table.csv", "table_columns_reversed.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,136 +1,172 @@
-import pandas as pd
-import numpy as np
+from indicator_merge import merge_indicators
+
+VALUE_COLUMN = "Average effective age of retirement (OECD)"
+
+
+def merge_retirement(filename1, filename2, output_csv="retirement.csv"):
+    # Average the retirement ages of women (filename1) and men (filename2),
+    # printing the rows missing one of them
+    return merge_indicators(
+        {"women's retirement age": filename1, "men's retirement age": filename2},
+        output_csv,
+        combine="mean",
+        output_column=VALUE_COLUMN,
+    )
+
+
+def _window_fits(groups, years, values, window, from_end, n_groups):
+    """
+    Least-squares lines through the first or last points of every group at once.
+
+    Args:
+        groups (np.ndarray): Group code of every point, points sorted by group
+            then year
+        years (np.ndarray): Year of every point
+        values (np.ndarray): Value of every point, NaN values are left out
+        window (int): Number of points of each fit
+        from_end (bool): Fit the last points of each group instead of the first
+        n_groups (int): Number of groups
+
+    Returns:
+        tuple: (slope, intercept, n_points) arrays with one entry per group; the
+        slope and intercept are NaN for groups with fewer than 2 points
+    """
+    import numpy as np
+
+    valid = ~np.isnan(values)
+    groups, years, values = groups[valid], years[valid], values[valid]
+
+    # Rank of every point within its group, counted from the start or the end
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(groups)) - starts[groups]
+    if from_end:
+        rank = counts[groups] - 1 - rank
+    keep = rank < window
+    groups, years, values = groups[keep], years[keep], values[keep]
+
+    # Closed-form simple regression on the centred points
+    n = np.bincount(groups, minlength=n_groups).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.bincount(groups, years, n_groups) / n
+        mean_y = np.bincount(groups, values, n_groups) / n
+        dx = years - mean_x[groups]
+        dy = values - mean_y[groups]
+        slope = np.bincount(groups, dx * dy, n_groups) / np.bincount(
+            groups, dx * dx, n_groups
+        )
+    slope[n < 2] = np.nan
+    return slope, mean_y - slope * mean_x, n
+
+
+def _predict(entities, codes, years, slope, intercept, value_column):
+    import numpy as np
+    import pandas as pd
+
+    # Evaluate every line on its row of the (group x year) matrix of years to
+    # predict, NaN years marking the unused cells
+    keep = ~np.isnan(years)
+    values = slope[:, None] * years + intercept[:, None]
+    rows = np.nonzero(keep)[0]
+    return pd.DataFrame(
+        {
+            "Entity": entities[rows],
+            "Code": codes[rows],
+            "Year": years[keep].astype(int),
+            value_column: values[keep],
+        }
+    )
+
+
+def fill_missing_data(
+    filename,
+    output_csv="retirement_filled.csv",
+    start_year=1960,
+    end_year=2022,
+    window=4,
+    value_column=VALUE_COLUMN,
+):
+    """
+    Extrapolates every country linearly to a common range of years.
+
+    The years before the first value of a country follow the regression line of
+    its first values, the years after its last value the line of its last values.
+
+    Args:
+        filename (str): Path to the retirement CSV file
+        output_csv (str): Path to the output CSV file
+        start_year (int): First year of the range
+        end_year (int): Last year of the range
+        window (int): Number of values each regression line is fitted on
+        value_column (str): Column holding the values
+
+    Returns:
+        pd.DataFrame: The completed data
+    """
+    import numpy as np
+    import pandas as pd
 
-
-def merge_retirement(filename1, filename2):
-    # Read the CSV files
-    df1 = pd.read_csv(filename1)
-    df2 = pd.read_csv(filename2)
-
-    # Rename columns to distinguish between men and women
-    df1.columns = ["Entity", "Code", "Year", "Women_Retirement_Age"]
-    df2.columns = ["Entity", "Code", "Year", "Men_Retirement_Age"]
-
-    # Merge the dataframes on Entity, Code, and Year
-    merged_df = pd.merge(df1, df2, on=["Entity", "Code", "Year"], how="outer")
-
-    # Check for missing data
-    missing_women = merged_df[merged_df["Women_Retirement_Age"].isna()]
-    missing_men = merged_df[merged_df["Men_Retirement_Age"].isna()]
-
-    # Print missing data information
-    if not missing_women.empty:
-        print("\nMissing women's retirement age data:")
-        for _, row in missing_women.iterrows():
-            print(f"Year: {row['Year']}, Country: {row['Entity']}, File: {filename1}")
-
-    if not missing_men.empty:
-        print("\nMissing men's retirement age data:")
-        for _, row in missing_men.iterrows():
-            print(f"Year: {row['Year']}, Country: {row['Entity']}, File: {filename2}")
-
-    # Calculate the average retirement age
-    merged_df["Average_Retirement_Age"] = (
-        merged_df["Women_Retirement_Age"] + merged_df["Men_Retirement_Age"]
-    ) / 2
-
-    # Create final dataframe with required columns
-    final_df = merged_df[["Entity", "Code", "Year", "Average_Retirement_Age"]]
-
-    # Rename the average column to match the desired format
-    final_df.columns = [
-        "Entity",
-        "Code",
-        "Year",
-        "Average effective age of retirement (OECD)",
-    ]
-
-    # Save to CSV
-    final_df.to_csv("retirement.csv", index=False)
-
-
-def fill_missing_data(filename):
     # Read the CSV file
     df = pd.read_csv(filename)
 
     # Convert Year to int to ensure proper sorting
     df["Year"] = df["Year"].astype(int)
 
-    # Create full year range from 1960 to 2022
-    full_years = pd.DataFrame({"Year": range(1960, 2023)})
-
-    # Process each country separately
-    entities = df["Entity"].unique()
-    complete_data = []
-
-    for entity in entities:
-        entity_data = df[df["Entity"] == entity].copy()
-        entity_code = entity_data["Code"].iloc[0]
-
-        # Merge with full years to identify gaps
-        entity_full = full_years.merge(entity_data, on="Year", how="left")
-
-        # Forward extrapolation
-        last_year = entity_data["Year"].max()
-        if last_year < 2022:  # Do forward extrapolation if data ends before 2022
-            # Get last 4 known years
-            last_known = entity_data.nlargest(4, "Year")
-            if len(last_known) >= 2:  # Need at least 2 points for regression
-                X = last_known["Year"].values.reshape(-1, 1)
-                y = last_known["Average effective age of retirement (OECD)"].values
-                model = np.polyfit(X.flatten(), y, 1)
-
-                # Predict forward
-                future_years = range(int(last_year + 1), 2023)
-                for year in future_years:
-                    predicted_value = model[0] * year + model[1]
-                    complete_data.append(
-                        {
-                            "Entity": entity,
-                            "Code": entity_code,
-                            "Year": year,
-                            "Average effective age of retirement (OECD)": predicted_value,
-                        }
-                    )
-
-        # Backward extrapolation
-        first_year = entity_data["Year"].min()
-        if (
-            first_year > 1960
-        ):  # Only do backward extrapolation if data starts after 1960
-            # Get first 4 known years
-            first_known = entity_data.nsmallest(4, "Year")
-            if len(first_known) >= 2:  # Need at least 2 points for regression
-                X = first_known["Year"].values.reshape(-1, 1)
-                y = first_known["Average effective age of retirement (OECD)"].values
-                model = np.polyfit(X.flatten(), y, 1)
-
-                # Predict backward
-                past_years = range(1960, int(first_year))
-                for year in past_years:
-                    predicted_value = model[0] * year + model[1]
-                    complete_data.append(
-                        {
-                            "Entity": entity,
-                            "Code": entity_code,
-                            "Year": year,
-                            "Average effective age of retirement (OECD)": predicted_value,
-                        }
-                    )
-
-        # Add existing data
-        complete_data.extend(entity_data.to_dict("records"))
+    # Sort once by country and year, countries coded in order of appearance
+    groups, entities = pd.factorize(df["Entity"])
+    n_groups = len(entities)
+    entities = entities.to_numpy()
+    _, first_rows = np.unique(groups, return_index=True)
+    codes = df["Code"].to_numpy()[first_rows]
+
+    order = np.lexsort((df["Year"].to_numpy(), groups))
+    groups = groups[order]
+    years = df["Year"].to_numpy()[order]
+    values = df[value_column].to_numpy(dtype=float)[order]
+
+    first_year = np.full(n_groups, np.iinfo(np.int64).max)
+    last_year = np.full(n_groups, np.iinfo(np.int64).min)
+    np.minimum.at(first_year, groups, years)
+    np.maximum.at(last_year, groups, years)
+
+    # Years to predict as (country x offset) matrices, NaN outside the gaps. They
+    # are as wide as the longest gap, which may start or end outside the range
+    # of years, e.g. for a country whose data ends before start_year
+    offsets = np.arange(max(end_year - last_year.min(initial=end_year), 0))
+    forward = last_year[:, None] + 1 + offsets[None, :]
+    forward = np.where(forward <= end_year, forward, np.nan)
+    offsets = np.arange(max(first_year.max(initial=start_year) - start_year, 0))
+    backward = start_year + offsets[None, :] + np.zeros((n_groups, 1))
+    backward = np.where(backward < first_year[:, None], backward, np.nan)
+
+    predictions = [df]
+    for from_end, predicted_years in ((True, forward), (False, backward)):
+        slope, intercept, _ = _window_fits(
+            groups, years, values, window, from_end, n_groups
+        )
+        # Countries with fewer than 2 values are not extrapolated
+        predicted_years[np.isnan(slope)] = np.nan
+        predictions.append(
+            _predict(entities, codes, predicted_years, slope, intercept, value_column)
+        )
 
     # Create final dataframe and sort
-    final_df = pd.DataFrame(complete_data)
+    final_df = pd.concat(predictions, ignore_index=True)
     final_df = final_df.sort_values(["Entity", "Year"])
 
     # Save to CSV
-    final_df.to_csv("retirement_filled.csv", index=False)
+    final_df.to_csv(output_csv, index=False)
+    return final_df
+
+
+def main():
+    # Merge the women's and men's retirement ages, then fill the missing years
+    merge_retirement(
+        "average-effective-retirement-women.csv",
+        "average-effective-retirement-men.csv",
+    )
+    fill_missing_data("retirement.csv")
 
 
-merge_retirement(
-    "average-effective-retirement-women.csv",
-    "average-effective-retirement-men.csv",
-)
-fill_missing_data("retirement.csv")
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,53 @@
-def convert_decimals(input_file):
+from delimited import normalize_delimited
+
+
+def convert_decimals(
+    input_file,
+    output_file=None,
+    delimiter=":",
+    out_delimiter=",",
+    decimal=",",
+    out_decimal=".",
+    thousands=None,
+    workers=1,
+):
     """
     Convert decimal separators from comma to period and change delimiters from colon to comma
     in a colon-delimited CSV file.
 
+    Quoted text fields are left unchanged. The separators can be changed to
+    normalize other locales, see delimited.normalize_delimited.
+
     Args:
         input_file (str): Path to the input CSV file
+        output_file (str): Path to the output CSV file, input_file with
+            '_converted' before the extension if not given
+        delimiter (str): Field delimiter of the input file
+        out_delimiter (str): Field delimiter of the output file
+        decimal (str): Decimal separator of the input file
+        out_decimal (str): Decimal separator of the output file
+        thousands (str): Thousands separator of the input file, removed between
+            digits, or None. Any single character, e.g. "\u202f"
+        workers (int): Number of worker processes for very large files, None for
+            the number of CPUs
     """
     # Generate output filename by adding '_converted' before the extension
-    output_file = (
-        input_file.rsplit(".", 1)[0] + "_converted." + input_file.rsplit(".", 1)[1]
-    )
+    if output_file is None:
+        output_file = (
+            input_file.rsplit(".", 1)[0] + "_converted." + input_file.rsplit(".", 1)[1]
+        )
 
     try:
-        # Read the input file and process line by line
-        with open(input_file, "r", encoding="utf-8") as infile:
-            with open(output_file, "w", encoding="utf-8") as outfile:
-                for line in infile:
-                    # First replace decimal commas with periods
-                    converted_line = line.replace(",", ".")
-                    # Then replace colons with commas
-                    converted_line = converted_line.replace(":", ",")
-                    outfile.write(converted_line)
-
+        normalize_delimited(
+            input_file,
+            output_file,
+            delimiter,
+            out_delimiter,
+            decimal,
+            out_decimal,
+            thousands,
+            workers=workers,
+        )
         print(f"Successfully converted {input_file} to {output_file}")
 
     except FileNotFoundError:
@@ -30,5 +56,10 @@ def convert_decimals(input_file):
         print(f"An error occurred: {str(e)}")
 
 
-# Example usage
-convert_decimals("oddnums.csv")
+def main():
+    # Convert the decimal commas of the odd numbers
+    convert_decimals("oddnums.csv")
+
+
+if __name__ == "__main__":
+    main()
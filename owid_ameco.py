@@ -0,0 +1,112 @@
+# Metadata columns of the AMECO workbooks, before the year columns
+AMECO_COLUMNS = [
+    "SERIES",
+    "CNTRY",
+    "TRN",
+    "AGG",
+    "UNIT",
+    "REF",
+    "CODE",
+    "COUNTRY",
+    "SUB-CHAPTER",
+    "TITLE",
+    "UNIT.1",
+]
+
+# AMECO-style tables are written as CSV with this suffix, the workbook loaders
+# pick them up like the AMECO workbooks
+AMECO_CSV_SUFFIX = ".ameco.csv"
+
+
+def _read_indicator(indicator):
+    import pandas as pd
+
+    # Long table of an indicator: a path or a DataFrame with Entity, Code, Year
+    # and the value column
+    source = indicator["source"]
+    df = pd.read_csv(source) if isinstance(source, str) else source
+    return df[["Entity", "Code", "Year", indicator["value_column"]]]
+
+
+def owid_to_ameco(indicators, years=None):
+    """
+    Pivots many OWID long-format indicators into AMECO-style wide rows at once.
+
+    All the indicators share one (series, year) grid: the series are coded
+    together, sorted by indicator then country, and every value is scattered
+    into a single matrix.
+
+    Args:
+        indicators (list): One dict per indicator with its "source" (path or
+            DataFrame), "value_column", and optionally its "title" (the value
+            column by default) and "unit"
+        years (iterable): Year columns, the sorted union of the indicator years
+            if None; other years are dropped
+
+    Returns:
+        pd.DataFrame: The AMECO metadata columns followed by one integer-named
+        column per year, in increasing order
+    """
+    import numpy as np
+    import pandas as pd
+
+    frames = [_read_indicator(indicator) for indicator in indicators]
+    lengths = [len(df) for df in frames]
+    entities = np.concatenate([df["Entity"].to_numpy(dtype=object) for df in frames])
+    codes = np.concatenate([df["Code"].to_numpy(dtype=object) for df in frames])
+    row_years = np.concatenate([df["Year"].to_numpy(dtype=np.int64) for df in frames])
+    values = np.concatenate([df.iloc[:, 3].to_numpy(dtype=float) for df in frames])
+    indicator_ids = np.repeat(np.arange(len(frames)), lengths)
+
+    # One code per (indicator, country) series
+    series, uniques = pd.MultiIndex.from_arrays(
+        [indicator_ids, entities, codes]
+    ).factorize(sort=True)
+
+    if years is None:
+        years = np.unique(row_years)
+    years = np.asarray(sorted(years), dtype=np.int64)
+    columns = np.searchsorted(years, row_years)
+    inside = (columns < len(years)) & (
+        years[np.minimum(columns, len(years) - 1)] == row_years
+    )
+
+    matrix = np.full((len(uniques), len(years)), np.nan)
+    matrix[series[inside], columns[inside]] = values[inside]
+
+    series_ids = uniques.get_level_values(0).to_numpy()
+    titles = [
+        indicator.get("title") or indicator["value_column"] for indicator in indicators
+    ]
+    units = [indicator.get("unit", "") for indicator in indicators]
+    metadata = pd.DataFrame(
+        {column: "" for column in AMECO_COLUMNS}, index=range(len(uniques))
+    )
+    metadata["CNTRY"] = uniques.get_level_values(2)
+    metadata["COUNTRY"] = uniques.get_level_values(1)
+    metadata["TITLE"] = np.asarray(titles, dtype=object)[series_ids]
+    metadata["UNIT.1"] = np.asarray(units, dtype=object)[series_ids]
+
+    return pd.concat([metadata, pd.DataFrame(matrix, columns=years.tolist())], axis=1)
+
+
+def write_ameco(frame, output_file):
+    """
+    Writes an AMECO-style table.
+
+    CSV is the default; an .xlsx extension writes Excel, which is much slower to
+    write and to read back. Name the file with AMECO_CSV_SUFFIX to have
+    build_ameco_data read it like the AMECO workbooks.
+
+    Args:
+        frame (pd.DataFrame): Table returned by owid_to_ameco
+        output_file (str): Output path
+
+    Returns:
+        str: The output path
+    """
+    if output_file.lower().endswith(".xlsx"):
+        frame.to_excel(output_file, index=False)
+    else:
+        frame.to_csv(output_file, index=False)
+    return output_file
@@ -0,0 +1,316 @@
+import mmap
+import os
+import re
+
+from delimited import BUFFER_SIZE
+from persist import INDEX_SUFFIX, load_sidecar
+
+PERIOD_INDEX_SUFFIX = ".periods" + INDEX_SUFFIX
+
+# Frequency codes of the period index
+ANNUAL, QUARTERLY, MONTHLY = 0, 1, 2
+PERIODS_PER_YEAR = {QUARTERLY: 4, MONTHLY: 12}
+
+# INSEE periods: "1960", "1960-T1" (or "1960-Q1") and "1960-01", maybe quoted
+PERIOD_PATTERN = re.compile(rb'^\s*"?(\d{4})(?:-(?:([TQ])([1-4])|(\d{2})))?"?\s*$')
+
+
+def parse_period(cell):
+    """
+    Parses a period cell.
+
+    Args:
+        cell (bytes): Cell of the period column
+
+    Returns:
+        tuple: (year, frequency, sub-period) with frequency ANNUAL, QUARTERLY or
+        MONTHLY and sub-period 0 for years, or None if the cell is not a period
+    """
+    match = PERIOD_PATTERN.match(cell)
+    if match is None:
+        return None
+    year, quarter_mark, quarter, month = match.groups()
+    if quarter_mark:
+        return int(year), QUARTERLY, int(quarter)
+    if month:
+        if not 1 <= int(month) <= 12:
+            return None
+        return int(year), MONTHLY, int(month)
+    return int(year), ANNUAL, 0
+
+
+def _scan_lines(file_path, buffer_size=BUFFER_SIZE):
+    # Yield the byte offset and content (without "\n") of every line, reading
+    # the file in fixed-size blocks
+    offset = 0
+    tail = b""
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(buffer_size)
+            if not block:
+                break
+            lines = (tail + block).split(b"\n")
+            tail = lines.pop()
+            for line in lines:
+                yield offset, line
+                offset += len(line) + 1
+    if tail:
+        yield offset, tail
+
+
+def build_period_index(file_path, delimiter=",", column=0, buffer_size=BUFFER_SIZE):
+    """
+    Indexes the lines of a time series file by the period of their period column.
+
+    The file is scanned once in fixed-size blocks and only the period cell of
+    each line is parsed.
+
+    Args:
+        file_path (str): Path to the CSV file, e.g. an INSEE series
+        delimiter (str): Field delimiter
+        column (int): Position of the period column
+        buffer_size (int): Number of bytes read at a time
+
+    Returns:
+        dict: The byte offsets ("starts", "ends") of the period lines with their
+        "year", "frequency" and "sub" period, and in "others" the offsets of the
+        lines that are not periods (headers, notes)
+    """
+    import numpy as np
+
+    encoded_delimiter = delimiter.encode()
+
+    starts, ends, years, frequencies, subs, others = [], [], [], [], [], []
+    for offset, line in _scan_lines(file_path, buffer_size):
+        cells = line.split(encoded_delimiter, column + 1)
+        period = parse_period(cells[column]) if len(cells) > column else None
+        if period is None:
+            if line.strip():
+                others.append((offset, offset + len(line)))
+            continue
+        starts.append(offset)
+        ends.append(offset + len(line))
+        years.append(period[0])
+        frequencies.append(period[1])
+        subs.append(period[2])
+
+    return {
+        "starts": np.array(starts, dtype=np.int64),
+        "ends": np.array(ends, dtype=np.int64),
+        "year": np.array(years, dtype=np.int16),
+        "frequency": np.array(frequencies, dtype=np.uint8),
+        "sub": np.array(subs, dtype=np.uint8),
+        "others": others,
+    }
+
+
+def load_period_index(file_path, delimiter=",", column=0):
+    """
+    Loads the period index of a file from its .periods.idx sidecar.
+
+    Args:
+        file_path (str): Path to the CSV file
+        delimiter (str): Field delimiter
+        column (int): Position of the period column
+
+    Returns:
+        dict: The period index, see build_period_index and persist.load_sidecar
+    """
+    return load_sidecar(
+        file_path,
+        PERIOD_INDEX_SUFFIX,
+        lambda: build_period_index(file_path, delimiter, column),
+        key=(delimiter, column),
+    )
+
+
+def _get_index(file_path, delimiter, column, indexed):
+    if indexed:
+        return load_period_index(file_path, delimiter, column)
+    return build_period_index(file_path, delimiter, column)
+
+
+def select_periods(index, years=None, quarters=None, months=None, annual=False):
+    """
+    Returns the lines of the index holding the requested periods.
+
+    Quarters, months and annual lines are combined: e.g. quarters=[4] and
+    annual=True select both the fourth quarters and the annual values. With none
+    of them, every period is selected.
+
+    Args:
+        index (dict): Period index, see build_period_index
+        years (iterable): Years to keep, all if None
+        quarters (iterable): Quarters (1 to 4) to keep
+        months (iterable): Months (1 to 12) to keep
+        annual (bool): Keep the annual lines
+
+    Returns:
+        np.ndarray: Positions of the selected lines in the index, in file order
+    """
+    import numpy as np
+
+    frequency, sub = index["frequency"], index["sub"]
+    if quarters is None and months is None and not annual:
+        mask = np.ones(len(frequency), dtype=bool)
+    else:
+        mask = np.zeros(len(frequency), dtype=bool)
+        if quarters is not None:
+            mask |= (frequency == QUARTERLY) & np.isin(sub, list(quarters))
+        if months is not None:
+            mask |= (frequency == MONTHLY) & np.isin(sub, list(months))
+        if annual:
+            mask |= frequency == ANNUAL
+    if years is not None:
+        mask &= np.isin(index["year"], list(years))
+    return np.flatnonzero(mask)
+
+
+def filter_periods(
+    file_path,
+    output_file,
+    years=None,
+    quarters=None,
+    months=None,
+    annual=False,
+    header=False,
+    delimiter=",",
+    column=0,
+    indexed=False,
+):
+    """
+    Copies the lines of the requested periods of a time series file.
+
+    Lines are copied byte for byte through a memory map of the file and written
+    in blocks.
+
+    Args:
+        file_path (str): Path to the CSV file
+        output_file (str): Path to the filtered CSV file
+        years, quarters, months, annual: Periods to keep, see select_periods
+        header (bool): Also copy the lines before the first period
+        delimiter (str): Field delimiter
+        column (int): Position of the period column
+        indexed (bool): Use the persisted period index, see load_period_index
+
+    Returns:
+        int: Number of period lines written
+    """
+    index = _get_index(file_path, delimiter, column, indexed)
+    selected = select_periods(index, years, quarters, months, annual)
+
+    first = index["starts"][0] if len(index["starts"]) else None
+    with open(file_path, "rb") as f, open(output_file, "wb") as output:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if header:
+                for start, end in index["others"]:
+                    if first is None or start < first:
+                        output.write(mm[start:end] + b"\n")
+
+            for block in range(0, len(selected), 10000):
+                rows = selected[block : block + 10000]
+                output.writelines(
+                    mm[start:end] + b"\n"
+                    for start, end in zip(index["starts"][rows], index["ends"][rows])
+                )
+    return len(selected)
+
+
+def _format_value(value):
+    import numpy as np
+
+    # Whole numbers are written without decimals, like the INSEE values
+    if np.isnan(value):
+        return ""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def aggregate_annual(
+    file_path,
+    output_file=None,
+    frequency=QUARTERLY,
+    how="sum",
+    complete=True,
+    years=None,
+    delimiter=",",
+    column=0,
+    value_column=1,
+    indexed=False,
+):
+    """
+    Aggregates the quarterly (or monthly) values of a time series to annual ones.
+
+    Args:
+        file_path (str): Path to the CSV file
+        output_file (str): If given, "year,value" lines are written to this file
+        frequency (int): QUARTERLY or MONTHLY
+        how (str): "sum" for flows, "mean" for levels or "last" for stocks
+        complete (bool): Drop the years missing some quarters (or months)
+        years (iterable): Years to aggregate, all if None
+        delimiter (str): Field delimiter
+        column (int): Position of the period column
+        value_column (int): Position of the value column
+        indexed (bool): Use the persisted period index, see load_period_index
+
+    Returns:
+        tuple: (years, values) arrays, sorted by year
+
+    Raises:
+        ValueError: If frequency or how is unknown
+    """
+    import numpy as np
+
+    if frequency not in PERIODS_PER_YEAR:
+        raise ValueError("frequency must be QUARTERLY or MONTHLY")
+    if how not in ("sum", "mean", "last"):
+        raise ValueError(f"Unknown aggregation {how!r}, expected sum, mean or last")
+
+    index = _get_index(file_path, delimiter, column, indexed)
+    subs = range(1, PERIODS_PER_YEAR[frequency] + 1)
+    selected = select_periods(
+        index,
+        years,
+        quarters=subs if frequency == QUARTERLY else None,
+        months=subs if frequency == MONTHLY else None,
+    )
+
+    encoded_delimiter = delimiter.encode()
+    values = np.full(len(selected), np.nan)
+    with open(file_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        for i, (start, end) in enumerate(
+            zip(index["starts"][selected], index["ends"][selected])
+        ):
+            cells = mm[start:end].rstrip(b"\r").split(encoded_delimiter)
+            try:
+                values[i] = float(cells[value_column].strip(b' "'))
+            except (IndexError, ValueError):
+                pass
+
+    # Group by year, the periods sorted within each year for "last"
+    order = np.lexsort((index["sub"][selected], index["year"][selected]))
+    period_years = index["year"][selected][order]
+    values = values[order]
+    annual_years, groups, counts = np.unique(
+        period_years, return_index=True, return_counts=True
+    )
+    if how == "last":
+        annual_values = values[groups + counts - 1]
+    else:
+        annual_values = np.add.reduceat(values, groups) if len(groups) else values
+        if how == "mean":
+            annual_values = annual_values / counts
+    if complete:
+        keep = counts == PERIODS_PER_YEAR[frequency]
+        annual_years, annual_values = annual_years[keep], annual_values[keep]
+
+    if output_file:
+        with open(output_file, "w") as output:
+            output.writelines(
+                f"{year},{_format_value(value)}\n"
+                for year, value in zip(annual_years, annual_values)
+            )
+    return annual_years.astype(int), annual_values
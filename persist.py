@@ -0,0 +1,101 @@
+import contextlib
+import os
+import pickle
+
+# Suffix of the indexes stored next to the file they index
+INDEX_SUFFIX = ".idx"
+
+# Errors of a missing, truncated or otherwise unreadable pickle
+UNREADABLE = (
+    OSError,
+    EOFError,
+    pickle.UnpicklingError,
+    AttributeError,
+    ImportError,
+    IndexError,
+    ValueError,
+)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="wb", encoding=None):
+    """
+    Opens a temporary file that replaces path once it is completely written.
+
+    A concurrent reader, or the next run after a crash, sees either the old file
+    or the new one, never half a file.
+
+    Args:
+        path (str): Path of the file to write
+        mode (str): "wb" or "w"
+        encoding (str): Encoding of the text mode
+
+    Yields:
+        The handle of the temporary file
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_pickle(obj, path):
+    """
+    Atomically pickles an object to a file.
+
+    Args:
+        obj: Object to pickle
+        path (str): Path of the pickle
+    """
+    with atomic_write(path) as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_pickle(path):
+    """
+    Unpickles a file, treating an unreadable file as a missing one.
+
+    Args:
+        path (str): Path of the pickle
+
+    Returns:
+        The unpickled object, or None if the file is missing or unreadable
+    """
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except UNREADABLE:
+        return None
+
+
+def load_sidecar(file_path, suffix, build, key=None):
+    """
+    Loads the data stored next to a file, rebuilding it if it is stale.
+
+    The data is pickled to file_path + suffix along with the size and
+    modification time of the file, and rebuilt whenever they change.
+
+    Args:
+        file_path (str): Path of the file the data is built from
+        suffix (str): Suffix of the sidecar file
+        build (callable): Called without arguments to build the data
+        key: Parameters of build, the data is rebuilt when they change
+
+    Returns:
+        The data returned by build, from the sidecar if it is up to date
+    """
+    sidecar_path = file_path + suffix
+    stat = os.stat(file_path)
+    stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "key": key}
+
+    stored = read_pickle(sidecar_path)
+    if isinstance(stored, dict) and stored.get("stamp") == stamp:
+        return stored["data"]
+
+    data = build()
+    write_pickle({"stamp": stamp, "data": data}, sidecar_path)
+    return data
@@ -0,0 +1,484 @@
+import argparse
+import ast
+import contextlib
+import fnmatch
+import glob
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from ameco_cache import current_fingerprint
+from persist import atomic_write
+
+STATE_FILE = ".pipeline_state.json"
+
+# Time allowed to import the modules of all the steps, pandas and numpy being
+# imported only when a step runs
+IMPORT_BUDGET = 0.1
+
+# Outcome of a step, like the one of a script: exit code and captured output
+StepResult = namedtuple("StepResult", ["returncode", "stdout", "stderr"])
+
+# Steps of the pipeline: the script whose main() is run, the data files it reads
+# (globs allowed) and the files it writes. The script and the local modules it
+# imports are inputs too, found by script_modules, so that code changes re-run
+# the step. Steps reading the outputs of another step run after it
+STEPS = [
+    {
+        "name": "hcpi",
+        "script": "hcpi_transformer.py",
+        "inputs": ["estat_prc_hicp_inw.tsv"],
+        "outputs": ["hcpi_miscellaneous_weights.csv"],
+    },
+    {
+        "name": "dividends",
+        "script": "dividends_transformer.py",
+        "inputs": ["valeurs_trimestrielles.csv"],
+        "outputs": ["dividends.csv"],
+    },
+    {
+        "name": "decimals",
+        "script": "number_converter.py",
+        "inputs": ["oddnums.csv"],
+        "outputs": ["oddnums_converted.csv"],
+    },
+    {
+        "name": "public_expenditure",
+        "script": "public_expenditure.py",
+        "inputs": ["government-expenditure-vs-gdp.csv"],
+        "outputs": ["france_expenditure.csv"],
+    },
+    {
+        "name": "gini",
+        "script": "interpolate_gini.py",
+        "inputs": ["gini.csv"],
+        "outputs": ["gini_interpolated.csv"],
+    },
+    {
+        "name": "working_hours",
+        "script": "interpolate_hours.py",
+        "inputs": ["annual-working-hours-per-worker.csv"],
+        "outputs": [
+            "annual-working-hours-per-worker_interpolated.csv",
+            "WorkingHours.ameco.csv",
+        ],
+    },
+    {
+        "name": "retirement",
+        "script": "merge_retirement.py",
+        "inputs": [
+            "average-effective-retirement-women.csv",
+            "average-effective-retirement-men.csv",
+        ],
+        "outputs": ["retirement.csv", "retirement_filled.csv"],
+    },
+    {
+        "name": "ameco_data",
+        "script": "preprocess_ameco.py",
+        "inputs": [
+            "ameco_queries.json",
+            "AMECO*.XLSX",
+            "*.ameco.csv",
+        ],
+        "outputs": ["ameco_data.csv"],
+    },
+    {
+        "name": "table_columns",
+        "script": "list_maker.py",
+        "inputs": ["table.csv"],
+        "outputs": ["table_columns_reversed.csv"],
+    },
+]
+
+
+def _expand(patterns):
+    # Files matching the input patterns, plain names are kept even when missing
+    files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern)))
+        else:
+            files.append(pattern)
+    return list(dict.fromkeys(files))
+
+
+def script_modules(script):
+    """
+    Finds the local modules a script imports, directly or through other modules.
+
+    Imports inside functions count too, the steps importing their libraries
+    lazily.
+
+    Args:
+        script (str): Path of the script
+
+    Returns:
+        list: Paths of the .py files next to the script that it depends on, sorted
+    """
+    directory = os.path.dirname(script)
+    found = set()
+    pending = [script] if os.path.exists(script) else []
+    while pending:
+        with open(pending.pop(), "r", encoding="utf-8") as f:
+            try:
+                tree = ast.parse(f.read())
+            except SyntaxError:
+                # The step fails when it runs
+                continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                path = os.path.join(directory, name.split(".")[0] + ".py")
+                if path not in found and path != script and os.path.exists(path):
+                    found.add(path)
+                    pending.append(path)
+    return sorted(found)
+
+
+def _step_inputs(step):
+    # Files read by a step: its script, the modules it imports and its data
+    script = step["script"]
+    return _expand([script] + script_modules(script) + step["inputs"])
+
+
+def plan_steps(steps=STEPS, targets=None):
+    """
+    Orders the steps of a pipeline and finds the steps each one depends on.
+
+    Args:
+        steps (list): Step declarations, see STEPS
+        targets (list): Names of the steps wanted, with the steps they depend on;
+            all the steps if None
+
+    Returns:
+        dict: Step name mapped to the set of names of the steps it depends on,
+        in the order of steps
+
+    Raises:
+        ValueError: If a target is unknown, two steps write the same file, or the
+            dependencies form a cycle
+    """
+    producers = {}
+    for step in steps:
+        for output in step["outputs"]:
+            if output in producers:
+                raise ValueError(
+                    f"{output} is written by {producers[output]} and {step['name']}"
+                )
+            producers[output] = step["name"]
+
+    dependencies = {}
+    for step in steps:
+        patterns = step["inputs"]
+        dependencies[step["name"]] = {
+            producers[output]
+            for output in producers
+            if any(fnmatch.fnmatch(output, pattern) for pattern in patterns)
+        } - {step["name"]}
+
+    if targets is not None:
+        unknown = set(targets) - set(dependencies)
+        if unknown:
+            raise ValueError(f"Unknown steps: {', '.join(sorted(unknown))}")
+        wanted = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in wanted:
+                wanted.add(name)
+                pending.extend(dependencies[name])
+        dependencies = {
+            name: deps for name, deps in dependencies.items() if name in wanted
+        }
+
+    # Reject cycles, which would never become ready
+    done = set()
+    while len(done) < len(dependencies):
+        ready = [n for n, d in dependencies.items() if n not in done and d <= done]
+        if not ready:
+            cycle = sorted(set(dependencies) - done)
+            raise ValueError(f"Dependency cycle between: {', '.join(cycle)}")
+        done.update(ready)
+    return dependencies
+
+
+def load_state(state_path=STATE_FILE):
+    """
+    Loads the pipeline state: the fingerprints of the files and of every step.
+
+    Args:
+        state_path (str): Path of the state file
+
+    Returns:
+        dict: {"files": stat and hash of every file seen, "steps": inputs and
+        outputs hashes of every step at its last successful run}
+    """
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"files": {}, "steps": {}}
+
+
+def save_state(state, state_path=STATE_FILE):
+    # Write to a temporary file first so an interrupted run keeps the old state
+    with atomic_write(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def _fingerprints(files, state):
+    # Content hashes of existing files, hashing only the ones whose size or
+    # modification time changed
+    hashes = {}
+    for file in files:
+        if not os.path.exists(file):
+            continue
+        sha256 = current_fingerprint(file, state["files"])
+        stat = os.stat(file)
+        state["files"][os.path.abspath(file)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+        }
+        hashes[file] = sha256
+    return hashes
+
+
+def _module_name(step):
+    return os.path.splitext(step["script"])[0]
+
+
+def _run_step(step):
+    # Call the main() of the script of a step in this worker process, capturing
+    # its output and turning exceptions and sys.exit into an exit code
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            importlib.import_module(_module_name(step)).main()
+        except SystemExit as e:
+            # sys.exit("message") prints the message and exits with 1
+            if isinstance(e.code, int):
+                returncode = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+    return StepResult(returncode, stdout.getvalue(), stderr.getvalue())
+
+
+def check_import_time(steps=STEPS, budget=IMPORT_BUDGET):
+    """
+    Measures the time taken to import the modules of the steps.
+
+    The modules are imported in a fresh interpreter, where none is loaded yet.
+
+    Args:
+        steps (list): Step declarations, see STEPS
+        budget (float): Seconds allowed
+
+    Returns:
+        tuple: (seconds, heavy, ok) with heavy the expensive libraries (pandas,
+        numpy, pyarrow) imported by the modules, and ok whether the imports took
+        at most budget seconds without importing any of them
+
+    Raises:
+        subprocess.CalledProcessError: If a module cannot be imported
+    """
+    modules = [_module_name(step) for step in steps]
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {', '.join(modules)}\n"
+        "print(time.perf_counter() - start)\n"
+        "print(' '.join(m for m in ('pandas', 'numpy', 'pyarrow') if m in sys.modules))"
+    )
+    # Run from the directory of the modules, wherever the check is started from
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    seconds, heavy = result.stdout.split("\n")[:2]
+    seconds, heavy = float(seconds), heavy.split()
+    return seconds, heavy, seconds <= budget and not heavy
+
+
+def run_pipeline(
+    targets=None,
+    steps=STEPS,
+    workers=None,
+    force=False,
+    dry_run=False,
+    verbose=False,
+    state_path=STATE_FILE,
+):
+    """
+    Runs the steps of the pipeline whose inputs or outputs changed.
+
+    A step is skipped when the hashes of its inputs (script included) are those
+    of its last successful run and its outputs are still the files it wrote.
+    Steps run on a pool of worker processes as soon as the steps they depend on
+    are done, each calling the main() of its script; a step whose inputs are
+    missing, or that depends on a failed step, is not run.
+
+    Args:
+        targets (list): Names of the steps to bring up to date, with the steps
+            they depend on; all the steps if None
+        steps (list): Step declarations, see STEPS
+        workers (int): Number of steps run at the same time, defaults to the
+            number of CPUs
+        force (bool): Run the steps even if they are up to date
+        dry_run (bool): Only print the steps that would run
+        verbose (bool): Print the output of the scripts
+        state_path (str): Path of the state file
+
+    Returns:
+        dict: Step name mapped to its status: "ran", "up to date", "failed",
+        "missing inputs", "blocked" or "would run"
+    """
+    dependencies = plan_steps(steps, targets)
+    by_name = {step["name"]: step for step in steps}
+    state = load_state(state_path)
+    status = {}
+
+    def check(name):
+        # Status of a step whose dependencies are done, None if it must run
+        step = by_name[name]
+        upstream = [status[dependency] for dependency in dependencies[name]]
+        if any(s not in ("ran", "up to date", "would run") for s in upstream):
+            return "blocked"
+        inputs = _step_inputs(step)
+        missing = [file for file in inputs if not os.path.exists(file)]
+        if missing and "would run" not in upstream:
+            print(f"{name}: missing {', '.join(missing)}")
+            return "missing inputs"
+        previous = state["steps"].get(name)
+        if force or previous is None or missing:
+            return None
+        if (
+            _fingerprints(inputs, state) == previous["inputs"]
+            and _fingerprints(step["outputs"], state) == previous["outputs"]
+        ):
+            return "up to date"
+        return None
+
+    def finish(name, result):
+        step = by_name[name]
+        if verbose and result.stdout:
+            print(result.stdout, end="")
+        if result.returncode != 0:
+            print(f"{name}: failed\n{result.stderr}", end="")
+            status[name] = "failed"
+            return
+        for output in step["outputs"]:
+            if not os.path.exists(output):
+                print(f"{name}: did not write {output}")
+                status[name] = "failed"
+                return
+        inputs = _step_inputs(step)
+        state["steps"][name] = {
+            "inputs": _fingerprints(inputs, state),
+            "outputs": _fingerprints(step["outputs"], state),
+        }
+        save_state(state, state_path)
+        status[name] = "ran"
+        print(f"{name}: done")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        running = {}
+        while len(status) < len(dependencies):
+            # Start every step whose dependencies are done
+            for name, deps in dependencies.items():
+                if name in status or name in running.values():
+                    continue
+                if not all(dependency in status for dependency in deps):
+                    continue
+                result = check(name)
+                if result is not None:
+                    status[name] = result
+                elif dry_run:
+                    print(f"{name}: would run {by_name[name]['script']}")
+                    status[name] = "would run"
+                else:
+                    print(f"{name}: running {by_name[name]['script']}")
+                    running[executor.submit(_run_step, by_name[name])] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(running.pop(future), future.result())
+
+    save_state(state, state_path)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bring the inputs of the Ameco page up to date"
+    )
+    parser.add_argument("targets", nargs="*", help="steps to run, all by default")
+    parser.add_argument("-j", "--workers", type=int, help="steps run in parallel")
+    parser.add_argument("--force", action="store_true", help="ignore the state")
+    parser.add_argument("-n", "--dry-run", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("--list", action="store_true", help="list the steps")
+    parser.add_argument(
+        "--check-imports",
+        action="store_true",
+        help=f"fail if importing the steps takes over {IMPORT_BUDGET * 1000:.0f} ms",
+    )
+    args = parser.parse_args(argv)
+
+    if args.check_imports:
+        seconds, heavy, ok = check_import_time()
+        print(f"steps imported in {seconds * 1000:.1f} ms")
+        if heavy:
+            print(f"imported at load time: {', '.join(heavy)}")
+        if not ok:
+            sys.exit(1)
+        return
+
+    if args.list:
+        for name, deps in plan_steps(STEPS).items():
+            after = f" (after {', '.join(sorted(deps))})" if deps else ""
+            print(f"{name}{after}")
+        return
+
+    status = run_pipeline(
+        args.targets or None,
+        workers=args.workers,
+        force=args.force,
+        dry_run=args.dry_run,
+        verbose=args.verbose,
+    )
+    summary = {}
+    for name, result in status.items():
+        summary.setdefault(result, []).append(name)
+    for result, names in summary.items():
+        print(f"{result}: {', '.join(names)}")
+    if "failed" in summary:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,214 +1,555 @@
-import pandas as pd
+from __future__ import annotations
+
+import json
 import os
-from typing import List
-import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from ameco_cache import (
+    CACHE_DIR,
+    current_fingerprint,
+    list_workbooks,
+    load_manifest,
+    load_workbooks,
+    save_manifest,
+)
+from ameco_index import INDEX_VERSION, build_index, load_index, lookup, rows_by_file
+from ameco_store import SeriesStore
+from keyword_matcher import KeywordMatcher
+from persist import atomic_write, read_pickle, write_pickle
+from query_spec import SPEC_FILE, load_query_spec, plan_queries
 
 
-def read_excel_files() -> List[pd.DataFrame]:
-    # Get all xlsx files in current directory
-    xlsx_files = [f for f in os.listdir(".") if f.lower().endswith(".xlsx")]
+def read_excel_files(
+    workers: Optional[int] = None, compact: bool = False
+) -> List[pd.DataFrame] | SeriesStore:
+    """
+    Reads every Excel file of the current directory, sorted by name.
+
+    Args:
+        workers: Number of processes parsing the workbooks that are not cached yet,
+            defaults to the number of CPUs
+        compact: Return the workbooks packed in a float32 SeriesStore, for
+            keeping them in memory across many searches. Its values are exact
+            to about 1e-7 relative, SeriesStore.from_frames(frames, "float64")
+            keeps them exactly
+
+    Returns:
+        The DataFrames of the files that could be read. Files that failed are
+        reported and left out, the others keep their sorted order.
+    """
+    # Get all workbooks (and AMECO-style CSV tables) in current directory
+    xlsx_files = list_workbooks()
     if not xlsx_files:
         print("No Excel files found in current directory")
         return
-    try:
-        return [pd.read_excel(file) for file in xlsx_files]
-    except Exception as e:
-        print(f"Error reading file: {str(e)}")
-        return []
 
+    # Parsed workbooks are cached on disk, only changed files are parsed again
+    frames, errors = load_workbooks(xlsx_files, workers)
+    for file in xlsx_files:
+        if file in errors:
+            print(f"Error reading file {file}: {str(errors[file])}")
+    if compact:
+        return SeriesStore.from_frames(frames)
+    return frames
 
-def search_keywords_in_excel(
-    keywords, units, excel_files: List[pd.DataFrame], exclude_keywords: List[str] = []
-):
-    # Create a list to store all matching rows
-    all_matches = []
 
-    for df in excel_files:
-        # Escape special regex characters in keywords
-        escaped_keywords = [re.escape(keyword) for keyword in keywords]
-        keyword_filter = df.iloc[:, 9].str.contains(
-            "|".join(escaped_keywords), case=False, na=False
+def _normalize_queries(queries: List[Tuple]) -> List[Tuple]:
+    # Fill in the optional exclude_keywords and mode of every query
+    return [
+        (
+            list(q[0]),
+            list(q[1]),
+            list(q[2]) if len(q) > 2 else [],
+            q[3] if len(q) > 3 else "substring",
+        )
+        for q in queries
+    ]
+
+
+def match_queries(
+    queries: List[Tuple], excel_files: List[pd.DataFrame] | SeriesStore, index: Dict
+) -> List[List[pd.DataFrame]]:
+    """
+    Finds the rows matching each query, before the country coverage filter.
+
+    The keywords of all queries are compiled into one matcher per match mode, which
+    runs once over the distinct titles of the index. The matching rows are then
+    found by dictionary lookups on title and unit instead of scanning every workbook.
+
+    Args:
+        queries: Tuples (keywords, units[, exclude_keywords[, mode]])
+        excel_files: DataFrames of the AMECO workbooks, or a SeriesStore of them
+        index: Series index of excel_files
+
+    Returns:
+        For every query, the matching rows of each workbook that has some
+    """
+    queries = _normalize_queries(queries)
+
+    # Match every distinct keyword of every query in a single scan per mode
+    titles = list(index["title"])
+    columns = {}
+    hits = {}
+    for mode in {q[3] for q in queries}:
+        patterns = list(
+            dict.fromkeys(k for q in queries if q[3] == mode for k in q[0] + q[2])
         )
+        columns[mode] = {pattern: i for i, pattern in enumerate(patterns)}
+        hits[mode] = KeywordMatcher(patterns, mode).match_values(titles)
+
+    all_matches = []
+    for keywords, units, exclude_keywords, mode in queries:
+        column = columns[mode]
+        wanted = hits[mode][:, [column[k] for k in keywords]].any(axis=1)
+        wanted &= ~hits[mode][:, [column[k] for k in exclude_keywords]].any(axis=1)
+        matching_titles = [title for title, keep in zip(titles, wanted) if keep]
         # Use exact matching for units
-        unit_filter = df.iloc[:, 10].isin(units)
-
-        # Add exclude filter if exclude_keywords is not empty
-        if exclude_keywords:
-            escaped_exclude = [re.escape(keyword) for keyword in exclude_keywords]
-            exclude_filter = ~df.iloc[:, 9].str.contains(
-                "|".join(escaped_exclude), case=False, na=False
-            )
-            # Combine all filters with AND operation
-            filter_condition = keyword_filter & unit_filter & exclude_filter
+        positions = lookup(index, title=matching_titles, unit=units)
+        if isinstance(excel_files, SeriesStore):
+            all_matches.append(excel_files.rows_by_file(positions))
         else:
-            # Use original filters if no exclude keywords
-            filter_condition = keyword_filter & unit_filter
+            all_matches.append(rows_by_file(index, excel_files, positions))
+    return all_matches
 
-        # Get matching rows
-        matching_rows = df[filter_condition]
 
-        if not matching_rows.empty:
-            all_matches.append(matching_rows)
+def keep_complete_countries(
+    queries: List[Tuple], all_matches: List[List[pd.DataFrame]]
+) -> Tuple[List[pd.DataFrame | None], List[pd.DataFrame | None]]:
+    """
+    Combines the matches of each query and keeps the countries covering all keywords.
 
-    if all_matches:
-        # Combine all matching rows and save to CSV
-        result_df = pd.concat(all_matches, ignore_index=True)
+    Args:
+        queries: Tuples (keywords, units[, exclude_keywords[, mode]])
+        all_matches: Matching rows of each query, as returned by match_queries
 
-        # Count occurrences of each country
-        country_counts = result_df.iloc[:, 1].value_counts()
-        # Keep only countries that appear for all keywords
-        valid_countries = country_counts[country_counts >= len(keywords)].index
-        # Filter the dataframe to keep only valid countries
-        result_df = result_df[result_df.iloc[:, 1].isin(valid_countries)]
-        return result_df
+    Returns:
+        A tuple (results, coverages) with, for every query, the filtered rows and
+        the coverage matrix, both None when nothing matched
+    """
+    import pandas as pd
+
+    results = []
+    coverages = []
+    for (keywords, _, _, mode), matches in zip(
+        _normalize_queries(queries), all_matches
+    ):
+        if not matches:
+            print("No matches found for the given keywords")
+            results.append(None)
+            coverages.append(None)
+            continue
+
+        # Combine all matching rows
+        result_df = pd.concat(matches, ignore_index=True)
+
+        # Keep only countries that have a series for every keyword
+        coverage = keyword_coverage(result_df, keywords, mode)
+        complete = coverage.index[coverage.all(axis=1)]
+        print_coverage_report(coverage)
+        results.append(result_df[result_df.iloc[:, 1].isin(complete)])
+        coverages.append(coverage)
+    return results, coverages
 
-    else:
-        print("No matches found for the given keywords")
+
+def search_keywords_batch(
+    queries: List[Tuple],
+    excel_files: List[pd.DataFrame] | SeriesStore,
+    index: Dict = None,
+    return_coverage: bool = False,
+):
+    """
+    Runs several keyword searches over the Excel files through the series index.
+
+    Args:
+        queries: Tuples (keywords, units[, exclude_keywords[, mode]]), with the same
+            meaning as the arguments of search_keywords_in_excel
+        excel_files: DataFrames of the AMECO workbooks, or a SeriesStore of them
+            (see read_excel_files), whose matching rows only are expanded
+        index: Series index of excel_files, loaded from the cache if not given
+        return_coverage: Also return the country x keyword coverage matrix of each
+            query, see keyword_coverage
+
+    Returns:
+        One result per query, in order, as search_keywords_in_excel would return it.
+        Only the countries with a series for every keyword of the query are kept.
+        With return_coverage, a tuple (results, coverages).
+    """
+    if index is None:
+        if isinstance(excel_files, SeriesStore):
+            index = load_index(excel_files.metadata_frames())
+        else:
+            index = load_index(excel_files)
+
+    all_matches = match_queries(queries, excel_files, index)
+    results, coverages = keep_complete_countries(queries, all_matches)
+
+    if return_coverage:
+        return results, coverages
+    return results
+
+
+def keyword_coverage(
+    result_df: pd.DataFrame, keywords: List[str], mode: str = "substring"
+) -> pd.DataFrame:
+    """
+    Builds the country x keyword coverage matrix of a search result.
+
+    The keywords are matched against the distinct titles of the result only, and
+    the hits are broadcast to the rows and reduced per country code.
+
+    Args:
+        result_df: Matching rows of a search
+        keywords: Keywords of the search
+        mode: Match mode of the search, see KeywordMatcher
+
+    Returns:
+        A boolean DataFrame indexed by country with one column per keyword, True
+        where the country has at least one row matching the keyword
+    """
+    import numpy as np
+    import pandas as pd
+
+    title_codes, titles = pd.factorize(result_df.iloc[:, 9])
+    title_hits = KeywordMatcher(keywords, mode).match_values(titles)
+    # Missing titles have code -1 and pick the trailing row without hits
+    title_hits = np.vstack([title_hits, np.zeros(len(keywords), dtype=bool)])
+
+    country_codes, country_names = pd.factorize(result_df.iloc[:, 1])
+    coverage = np.zeros((len(country_names), len(keywords)), dtype=bool)
+    known = country_codes >= 0
+    np.logical_or.at(coverage, country_codes[known], title_hits[title_codes[known]])
+    return pd.DataFrame(coverage, index=country_names, columns=keywords)
+
+
+def print_coverage_report(coverage: pd.DataFrame):
+    """
+    Prints a one-line summary of a coverage matrix and the countries it drops.
+
+    Args:
+        coverage: Coverage matrix returned by keyword_coverage
+    """
+    complete = coverage.all(axis=1)
+    dropped = ", ".join(coverage.index[~complete])
+    print(
+        f"Coverage: {int(complete.sum())}/{len(coverage)} countries complete "
+        f"for {coverage.shape[1]} keywords"
+        + (f", dropped {dropped}" if dropped else "")
+    )
+
+
+def search_keywords_in_excel(
+    keywords,
+    units,
+    excel_files: List[pd.DataFrame] | SeriesStore,
+    exclude_keywords: List[str] = [],
+    mode: str = "substring",
+):
+    return search_keywords_batch(
+        [(keywords, units, exclude_keywords, mode)], excel_files
+    )[0]
+
+
+def _common_dtypes(frames: List[pd.DataFrame], columns: List) -> Dict:
+    import numpy as np
+    import pandas as pd
+
+    # Numeric dtypes pd.concat would give each column, so that writing the frames
+    # one by one yields the same values as writing their concatenation
+    dtypes = {}
+    for column in columns:
+        present = [df[column].dtype for df in frames if column in df.columns]
+        if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in present):
+            continue
+        dtype = np.result_type(*present)
+        if len(present) < len(frames) and dtype.kind in "iub":
+            # Frames without the column contribute NaN
+            dtype = np.dtype("float64")
+        dtypes[column] = dtype
+    return dtypes
+
+
+def _parquet_schema(columns: List):
+    import pyarrow as pa
+
+    # Schema of the whole output, not of the first chunk: a text column that is
+    # all NaN in one workbook (e.g. SERIES of WorkingHours) must stay a string
+    return pa.schema(
+        [
+            (str(column), pa.float64() if isinstance(column, int) else pa.string())
+            for column in columns
+        ]
+    )
+
+
+def _open_csv(filename: str, compression: str | None):
+    # Text handle on the output file, compressed according to compression
+    if compression == "infer":
+        compression = {".gz": "gzip", ".zst": "zstd"}.get(
+            os.path.splitext(filename)[1].lower()
+        )
+    if compression is None:
+        return open(filename, "w", encoding="utf-8", newline="")
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(filename, "wt", encoding="utf-8", newline="")
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.open(filename, "wt", encoding="utf-8", newline="")
+    raise ValueError(f"Unsupported compression: {compression}")
 
 
 # put all results into a single csv (ameco_data.csv)
-def results_to_csv(result_df: pd.DataFrame | List[pd.DataFrame], filename: str):
+def results_to_csv(
+    result_df: pd.DataFrame | List[pd.DataFrame],
+    filename: str,
+    chunksize: int = 10000,
+    compression: str | None = "infer",
+):
     """
-    Saves a DataFrame or combines multiple dataframes and saves them to a CSV file.
+    Saves a DataFrame or streams multiple dataframes to a CSV or Parquet file.
+
+    The dataframes are never concatenated: each one is written in chunks of rows,
+    aligned on the union of all their columns, so memory use does not grow with
+    the size of the output.
 
     Args:
         result_df: A pandas DataFrame or list of pandas DataFrames to be saved
-        filename: Name of the output CSV file
+        filename: Name of the output file. A .parquet extension writes Parquet
+            (requires pyarrow), anything else writes CSV
+        chunksize: Number of rows written at a time
+        compression: CSV compression, None, "gzip" or "zstd" (requires
+            zstandard). "infer" picks it from a .gz or .zst extension
     """
+    import pandas as pd
+
     # Check if input is None or empty list
     if result_df is None or (isinstance(result_df, list) and len(result_df) == 0):
         print("No data to save")
         return
 
-    # Handle single DataFrame
-    if isinstance(result_df, pd.DataFrame):
-        combined_df = result_df
-    else:
-        # Combine multiple dataframes
-        combined_df = pd.concat(result_df, ignore_index=True)
+    frames = [result_df] if isinstance(result_df, pd.DataFrame) else result_df
+    frames = [df for df in frames if df is not None]
 
-    # Replace 'Germany ("linked")' with 'Germany' in the country column (index 7)
-    combined_df.iloc[:, 7] = combined_df.iloc[:, 7].replace(
-        'Germany ("linked")', "Germany"
-    )
+    # Columns in the order pd.concat would produce them, except for the year
+    # columns which always follow in increasing order
+    columns = list(dict.fromkeys(c for df in frames for c in df.columns))
+    years = sorted(c for c in columns if isinstance(c, int))
+    columns = [c for c in columns if not isinstance(c, int)] + years
+    dtypes = _common_dtypes(frames, columns)
+    parquet = filename.lower().endswith(".parquet")
+
+    writer = None
+    schema = _parquet_schema(columns) if parquet else None
+    handle = None if parquet else _open_csv(filename, compression)
+    try:
+        header = True
+        for df in frames:
+            for start in range(0, len(df), chunksize):
+                chunk = df.iloc[start : start + chunksize].reindex(columns=columns)
+                chunk = chunk.astype(dtypes)
+
+                # Replace 'Germany ("linked")' with 'Germany' in the country column
+                chunk.iloc[:, 7] = chunk.iloc[:, 7].replace(
+                    'Germany ("linked")', "Germany"
+                )
+
+                if not parquet:
+                    chunk.to_csv(handle, header=header, index=False)
+                    header = False
+                    continue
+
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                # Parquet only accepts string column names, the year columns are ints
+                chunk.columns = schema.names
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(filename, schema)
+                writer.write_table(table.cast(schema))
+    finally:
+        if handle is not None:
+            handle.close()
+        if writer is not None:
+            writer.close()
 
-    # Save to CSV
-    combined_df.to_csv(filename, index=False)
     print(f"Data saved to {filename}")
 
 
-if __name__ == "__main__":
-    excel_files = read_excel_files()
+def _extract_path(cache_dir: str, sha256: str) -> str:
+    # Extracts made with other index keys (e.g. case-folded units) are not reused
+    return os.path.join(cache_dir, f"extract-{sha256}-v{INDEX_VERSION}.pickle")
 
-    results = search_keywords_in_excel(
-        [
-            "Compensation of employees: total economy",
-            "Taxes linked to imports and production minus subsidies: total economy",
-            "Consumption of fixed capital at current prices: total economy",
-            "Net operating surplus: total economy :- Adjusted for imputed compensation of self-employed",
-            "Gross operating surplus: total economy",
-            "Gross operating surplus: total economy :- Adjusted for imputed compensation of self-employed",
-            "Net primary income from the rest of the world",
-        ],
-        ["Mrd ECU/EUR"],
-        excel_files,
-    )
-    results2 = search_keywords_in_excel(
-        [
-            "Population: 0 to 14 years",
-            "Population: 15 to 64 years",
-            "Population: 65 years and over",
-            "Population: 75 years and over",
-            "Total population",
-            "Employment, persons: total economy",
-            "Total unemployment :- Member States: definition EUROSTAT",
-        ],
-        ["1000 persons"],
-        excel_files,
-        ["Total population (National accounts)"],
-    )
-    results3 = search_keywords_in_excel(
-        [
-            "Private final consumption expenditure at current prices",
-            "Individual consumption of general government at current prices",
-            "Collective consumption of general government at current prices",
-            "Gross capital formation at current prices: total economy",
-            "Consumption of fixed capital at current prices: total economy",
-            "Net exports of goods and services at current prices",
-        ],
-        ["Mrd ECU/EUR"],
-        excel_files,
-    )
-    results4 = search_keywords_in_excel(
-        [
-            "Subsidies: general government :- ESA 2010",
-            "Social benefits other than social transfers in kind: general government :- ESA 2010 ",
-            "Social transfers in kind supplied to households via market producers: general government :- ESA 2010 ",
-            "Interest: general government :- ESA 2010 ",
-            "Compensation of employees: general government :- ESA 2010 ",
-            "Intermediate consumption: general government :- ESA 2010 ",
-            "Other current expenditure: general government :- ESA 2010 ",
-            "Gross fixed capital formation: general government :- ESA 2010 ",
-            "Other capital expenditure, including capital transfers: general government :- ESA 2010 ",
-        ],
-        ["(Percentage of GDP at current prices (excessive deficit procedure)) "],
-        excel_files,
-    )
-    results5 = search_keywords_in_excel(
-        [
-            "Average annual working hours per worker",
-            "Price deflator private final consumption expenditure",
-            "Gross domestic product at current prices",
-        ],
-        ["Hours", "ECU/EUR: 2015 = 100", "Mrd ECU/EUR"],
-        excel_files,
-    )
-    results6 = search_keywords_in_excel(
-        [
-            "Employment, persons: agriculture, forestry and fishery products",
-            "Employment, persons: industry excluding building and construction",
-            "Employment, persons: building and construction",
-            "Employment, persons: services",
-        ],
-        ["1000 persons"],
-        excel_files,
-    )
-    results7 = search_keywords_in_excel(
-        [
-            "Price deflator gross value added: agriculture, forestry and fishery products",
-            "Price deflator gross value added: industry excluding building and construction",
-            "Price deflator gross value added: building and construction",
-            "Price deflator gross value added: services",
-            "Gross Value Added at current prices: agriculture, forestry and fishery products",
-            "Gross value added at current prices: industry excluding building and construction",
-            "Gross value added at current prices: building and construction",
-            "Gross value added at current prices: services",
-        ],
-        ["Mrd ECU/EUR", "ECU/EUR: 2015 = 100"],
-        excel_files,
-    )
-    results8 = search_keywords_in_excel(
-        [
-            "Exports of goods at current prices",
-            "Price deflator exports of goods",
-            "Exports of services at current prices",
-            "Price deflator exports of services",
-            "Imports of goods at current prices",
-            "Price deflator imports of goods",
-            "Imports of services at current prices",
-            "Price deflator imports of services",
-            "Price deflator gross domestic product",
-        ],
-        ["Mrd ECU/EUR", "ECU/EUR: 2015 = 100"],
-        excel_files,
+
+def build_ameco_data(
+    spec_path: str = SPEC_FILE,
+    filename: str = "ameco_data.csv",
+    workers: Optional[int] = None,
+    incremental: bool = True,
+    cache_dir: str = CACHE_DIR,
+):
+    """
+    Builds ameco_data.csv from a query spec, re-running only what changed.
+
+    The matching rows of every workbook are cached per workbook fingerprint and
+    per query group. A rebuild loads the cached extracts, then reads and searches
+    only the workbooks that changed, and only for the groups they are missing:
+    editing one group of the spec re-runs that group alone. The extracts are
+    spliced together in workbook order before the country coverage filter and
+    the output is rewritten. A manifest next to the output records the
+    fingerprint of every workbook and how many rows it contributed to each group;
+    when neither the spec nor any workbook changed the output is left untouched.
+
+    Args:
+        spec_path: Path of the JSON query spec, see query_spec.compile_spec
+        filename: Name of the output file, see results_to_csv
+        workers: Number of processes parsing the workbooks that are not cached yet
+        incremental: Reuse the cached extracts, False re-extracts everything
+        cache_dir: Directory holding the cache
+    """
+    # Get all workbooks (and AMECO-style CSV tables) in current directory
+    xlsx_files = list_workbooks()
+    if not xlsx_files:
+        print("No Excel files found in current directory")
+        return
+
+    plan = load_query_spec(spec_path, cache_dir)
+    groups = plan["groups"]
+    queries = plan_queries(plan)
+
+    manifest = load_manifest(cache_dir)
+    fingerprints = {}
+    for file in xlsx_files:
+        try:
+            fingerprints[file] = current_fingerprint(file, manifest)
+        except OSError as e:
+            print(f"Error reading file {file}: {str(e)}")
+    save_manifest(manifest, cache_dir)
+
+    output_manifest_path = f"{filename}.manifest.json"
+    try:
+        with open(output_manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = None
+
+    if incremental and previous and os.path.exists(filename):
+        stat = os.stat(filename)
+        previous_fingerprints = {
+            file: workbook["sha256"] for file, workbook in previous["workbooks"].items()
+        }
+        if (
+            previous["spec"] == plan["spec"]
+            and previous.get("version") == INDEX_VERSION
+            and previous_fingerprints == fingerprints
+            and previous["output"] == [stat.st_size, stat.st_mtime_ns]
+        ):
+            print(f"{filename} is up to date")
+            return
+
+    # Load the cached extracts and find the groups each workbook is missing
+    extracts = {}
+    missing = set()
+    stale = []
+    for file, sha256 in fingerprints.items():
+        extract = None
+        if incremental:
+            # An unreadable extract (e.g. truncated) is extracted again
+            extract = read_pickle(_extract_path(cache_dir, sha256))
+        if not isinstance(extract, dict):
+            extract = {}
+        extracts[file] = extract
+        todo = [i for i, group in enumerate(groups) if group["key"] not in extract]
+        if todo:
+            stale.append(file)
+            missing.update(todo)
+
+    if stale:
+        missing = sorted(missing)
+        print(
+            f"Extracting {len(missing)} group(s) from {len(stale)} workbook(s): "
+            f"{', '.join(stale)}"
+        )
+        frames, errors = load_workbooks(stale, workers, cache_dir)
+        for file in stale:
+            if file in errors:
+                print(f"Error reading file {file}: {str(errors[file])}")
+                del extracts[file]
+
+        all_matches = match_queries(
+            [queries[i] for i in missing], frames, build_index(frames)
+        )
+        for i, matches in zip(missing, all_matches):
+            key = groups[i]["key"]
+            for df in frames:
+                extracts[df.attrs["path"]][key] = None
+            for selection in matches:
+                extracts[selection.attrs["path"]][key] = selection
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for df in frames:
+            file = df.attrs["path"]
+            # Groups removed from the spec are dropped from the extract
+            current = {g["key"]: extracts[file][g["key"]] for g in groups}
+            write_pickle(current, _extract_path(cache_dir, fingerprints[file]))
+
+    # Splice the extracts back together in workbook order
+    files = [file for file in fingerprints if file in extracts]
+    all_matches = [
         [
-            "Net exports of services at current prices (National accounts) ",
-            "Net exports of goods at current prices (National accounts) ",
-            "Price deflator exports of goods and services ",
-            "Price deflator imports of goods and services ",
-        ],
-    )
-    results_to_csv(
-        [results, results2, results3, results4, results5, results6, results7, results8],
-        "ameco_data.csv",
-    )
+            extracts[file][group["key"]]
+            for file in files
+            if extracts[file][group["key"]] is not None
+        ]
+        for group in groups
+    ]
+    results, coverages = keep_complete_countries(queries, all_matches)
+    results_to_csv(results, filename)
+
+    # Record which workbook contributed how many rows to each group
+    workbooks = {}
+    for file in files:
+        rows = {}
+        for group, coverage in zip(groups, coverages):
+            selection = extracts[file][group["key"]]
+            if selection is None:
+                rows[group["name"]] = 0
+                continue
+            complete = coverage.index[coverage.all(axis=1)]
+            rows[group["name"]] = int(selection.iloc[:, 1].isin(complete).sum())
+        workbooks[file] = {"sha256": fingerprints[file], "rows": rows}
+
+    stat = os.stat(filename)
+    # An interrupted run leaves the previous manifest, never half of one
+    with atomic_write(output_manifest_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "spec": plan["spec"],
+                "version": INDEX_VERSION,
+                "output": [stat.st_size, stat.st_mtime_ns],
+                "workbooks": workbooks,
+            },
+            f,
+            indent=2,
+        )
+
+    # Drop the extracts no workbook refers to anymore
+    current = {_extract_path(cache_dir, sha256) for sha256 in fingerprints.values()}
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith("extract-") and path not in current:
+            os.remove(path)
+
+
+def main():
+    # Build the Ameco page data from the query specification
+    build_ameco_data(SPEC_FILE, "ameco_data.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,165 @@
-def filter_france_data(input_csv_name, output_csv_name="france_expenditure.csv"):
+import csv
+import os
+
+# OWID names of the EU member states
+EU_COUNTRIES = [
+    "Austria",
+    "Belgium",
+    "Bulgaria",
+    "Croatia",
+    "Cyprus",
+    "Czechia",
+    "Denmark",
+    "Estonia",
+    "Finland",
+    "France",
+    "Germany",
+    "Greece",
+    "Hungary",
+    "Ireland",
+    "Italy",
+    "Latvia",
+    "Lithuania",
+    "Luxembourg",
+    "Malta",
+    "Netherlands",
+    "Poland",
+    "Portugal",
+    "Romania",
+    "Slovakia",
+    "Slovenia",
+    "Spain",
+    "Sweden",
+]
+
+# Rows read at a time by the chunked reads
+CHUNK_ROWS = 100000
+
+
+def _read_matching_pyarrow(input_csv_name, column, entities):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+
+    # Every column is read as text, so a type inferred from the first block can
+    # never fail on a later one; the selection is typed afterwards
+    with open(input_csv_name, "r", encoding="utf-8") as f:
+        header = next(csv.reader(f))
+    reader = pv.open_csv(
+        input_csv_name,
+        convert_options=pv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=True,
+        ),
+    )
+
+    value_set = pa.array(entities, type=pa.string())
+    batches = []
+    for batch in reader:
+        # Only the rows of the requested entities leave the batch
+        mask = pc.is_in(batch.column(column), value_set=value_set)
+        batches.append(batch.filter(mask))
+    return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+
+def _read_matching_pandas(input_csv_name, column, entities):
+    import pandas as pd
+
+    chunks = [
+        chunk[chunk[column].isin(entities)]
+        for chunk in pd.read_csv(input_csv_name, dtype=str, chunksize=CHUNK_ROWS)
+    ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _infer_types(df):
     import pandas as pd
 
-    # Read the CSV file
-    df = pd.read_csv(input_csv_name)
+    # Type the text columns like read_csv would, but on the selected rows only
+    for name in df.columns:
+        try:
+            df[name] = pd.to_numeric(df[name])
+        except (ValueError, TypeError):
+            pass
+    return df
 
-    # Filter for France only
-    france_df = df[df["Entity"] == "France"]
 
-    # Save to new CSV file
-    france_df.to_csv(output_csv_name, index=False)
+def filter_entities(
+    input_csv_name,
+    entities,
+    output_pattern="{entity}_expenditure.csv",
+    partition_dir=None,
+    column="Entity",
+):
+    """
+    Extracts the rows of many entities of an Our World in Data CSV in one read.
+
+    The file is read in chunks and each chunk is filtered before anything else is
+    done with it, with pyarrow when it is installed and pandas otherwise.
+
+    Args:
+        input_csv_name (str): Path to the OWID CSV file
+        entities (list): Entities to extract, e.g. EU_COUNTRIES
+        output_pattern (str): Output file of each entity, {entity} is replaced by
+            the lower case entity name with spaces replaced by underscores.
+            None to skip writing
+        partition_dir (str): If given, the rows are also written as a dataset
+            partitioned by entity: partition_dir/Entity=France/data.csv
+        column (str): Column holding the entity names
+
+    Returns:
+        dict: The DataFrame of each entity found in the file
+    """
+    entities = list(dict.fromkeys(entities))
+    try:
+        selection = _read_matching_pyarrow(input_csv_name, column, entities)
+    except ImportError:
+        selection = _read_matching_pandas(input_csv_name, column, entities)
+    selection = _infer_types(selection)
+
+    results = {}
+    for entity, df in selection.groupby(column, sort=False):
+        df = df.reset_index(drop=True)
+        results[entity] = df
+        if output_pattern:
+            name = entity.lower().replace(" ", "_")
+            df.to_csv(output_pattern.format(entity=name), index=False)
+        if partition_dir:
+            directory = os.path.join(partition_dir, f"{column}={entity}")
+            os.makedirs(directory, exist_ok=True)
+            df.drop(columns=column).to_csv(
+                os.path.join(directory, "data.csv"), index=False
+            )
+
+    missing = [entity for entity in entities if entity not in results]
+    if missing:
+        print(f"Entities not found in {input_csv_name}: {', '.join(missing)}")
+    return {entity: results[entity] for entity in entities if entity in results}
+
+
+def filter_france_data(input_csv_name, output_csv_name="france_expenditure.csv"):
+    import pandas as pd
+
+    # Filter for France only, the output name is a pattern without placeholders
+    output_pattern = output_csv_name.replace("{", "{{").replace("}", "}}")
+    france_df = filter_entities(
+        input_csv_name, ["France"], output_pattern=output_pattern
+    ).get("France")
+
+    if france_df is None:
+        # No French rows, save the header of the file alone
+        with open(input_csv_name, "r", encoding="utf-8") as f:
+            header = next(csv.reader(f))
+        france_df = pd.DataFrame(columns=header)
+        france_df.to_csv(output_csv_name, index=False)
 
     return france_df
 
 
-filter_france_data("government-expenditure-vs-gdp.csv")
+def main():
+    # Extract the French public expenditure
+    filter_france_data("government-expenditure-vs-gdp.csv")
+
+
+if __name__ == "__main__":
+    main()
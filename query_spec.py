@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Tuple
+
+from ameco_cache import CACHE_DIR
+from keyword_matcher import MATCH_MODES
+from persist import read_pickle, write_pickle
+
+SPEC_FILE = "ameco_queries.json"
+
+
+def _string_list(group: dict, field: str, required: bool) -> List[str]:
+    # Check that a group field is a list of strings, kept verbatim: some keywords
+    # only match thanks to their trailing space
+    values = group.get(field, [])
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise ValueError(
+            f"Group {group.get('name')!r}: {field} must be a list of strings"
+        )
+    if required and not values:
+        raise ValueError(f"Group {group.get('name')!r}: {field} must not be empty")
+    return values
+
+
+def compile_spec(spec: dict) -> List[Dict]:
+    """
+    Validates a query spec and compiles it into the groups of an extraction plan.
+
+    Args:
+        spec: Parsed spec, {"groups": [{"name", "keywords", "units"[, "exclude"]
+            [, "mode"]}, ...]}
+
+    Returns:
+        The groups, with defaults filled in and a "key" hashing everything but the
+        name, so that renaming a group does not re-run it
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    groups = spec.get("groups") if isinstance(spec, dict) else None
+    if not isinstance(groups, list) or not groups:
+        raise ValueError("Query spec must have a non-empty 'groups' list")
+
+    compiled = []
+    names = set()
+    for i, group in enumerate(groups):
+        if not isinstance(group, dict):
+            raise ValueError(f"Group {i} must be an object")
+        name = group.get("name", f"group_{i}")
+        if name in names:
+            raise ValueError(f"Duplicate group name {name!r}")
+        names.add(name)
+
+        unknown = set(group) - {"name", "keywords", "units", "exclude", "mode"}
+        if unknown:
+            raise ValueError(f"Group {name!r}: unknown fields {sorted(unknown)}")
+        mode = group.get("mode", "substring")
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Group {name!r}: mode must be one of {MATCH_MODES}")
+
+        query = {
+            "keywords": _string_list(group, "keywords", required=True),
+            "units": _string_list(group, "units", required=True),
+            "exclude": _string_list(group, "exclude", required=False),
+            "mode": mode,
+        }
+        key = hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()
+        compiled.append({"name": name, **query, "key": key})
+    return compiled
+
+
+def load_query_spec(spec_path: str = SPEC_FILE, cache_dir: str = CACHE_DIR) -> Dict:
+    """
+    Loads the extraction plan of a query spec, compiling the spec only once.
+
+    Compiled plans are cached under the hash of the spec file, so an unchanged spec
+    is neither parsed nor validated again.
+
+    Args:
+        spec_path: Path of the JSON query spec
+        cache_dir: Directory holding the cache
+
+    Returns:
+        The plan, {"spec": spec hash, "groups": compiled groups}
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    with open(spec_path, "rb") as f:
+        content = f.read()
+    spec_hash = hashlib.sha256(content).hexdigest()
+
+    plan_path = os.path.join(cache_dir, f"plan-{spec_hash[:16]}.pickle")
+    plan = read_pickle(plan_path)
+    if isinstance(plan, dict) and plan.get("spec") == spec_hash:
+        return plan
+
+    plan = {"spec": spec_hash, "groups": compile_spec(json.loads(content))}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    write_pickle(plan, plan_path)
+    return plan
+
+
+def plan_queries(plan: Dict) -> List[Tuple]:
+    """
+    Converts the groups of a plan into the query tuples of search_keywords_batch.
+
+    Args:
+        plan: Plan returned by load_query_spec
+
+    Returns:
+        Tuples (keywords, units, exclude_keywords, mode), one per group
+    """
+    return [
+        (group["keywords"], group["units"], group["exclude"], group["mode"])
+        for group in plan["groups"]
+    ]
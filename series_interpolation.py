@@ -0,0 +1,391 @@
+import argparse
+
+
+from owid_ameco import owid_to_ameco, write_ameco
+
+METHODS = ("linear", "pchip", "spline", "log-linear")
+EXTRAPOLATIONS = ("none", "ffill", "hold", "linear")
+
+
+def _pack(groups, x, y):
+    import numpy as np
+
+    # Pack the valid points into (series x point) matrices padded with NaN
+    counts = np.bincount(groups)
+    starts = np.cumsum(counts) - counts
+    k = np.arange(len(groups)) - starts[groups]
+    X = np.full((len(counts), max(counts.max(initial=0), 1)), np.nan)
+    Y = X.copy()
+    X[groups, k] = x
+    Y[groups, k] = y
+    return X, Y, counts, k
+
+
+def _pchip_edge(h0, h1, d0, d1):
+    import numpy as np
+
+    # One-sided three-point derivative at the end of a series, kept shape-preserving
+    slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+    slope = np.where(np.sign(slope) != np.sign(d0), 0.0, slope)
+    overshoot = (np.sign(d0) != np.sign(d1)) & (np.abs(slope) > 3 * np.abs(d0))
+    return np.where(overshoot, 3 * d0, slope)
+
+
+def _pchip_slopes(X, Y, counts):
+    """
+    Derivatives of the shape-preserving PCHIP interpolant at every valid point.
+
+    Uses the Fritsch-Butland weighted harmonic mean inside the series and the
+    one-sided three-point estimate at both ends, like scipy's PchipInterpolator.
+
+    Args:
+        X (np.ndarray): Packed years, see _pack
+        Y (np.ndarray): Packed values
+        counts (np.ndarray): Number of valid points of each series
+
+    Returns:
+        np.ndarray: Packed derivatives
+    """
+    import numpy as np
+
+    h = np.diff(X, axis=1)
+    delta = np.diff(Y, axis=1) / h
+    D = np.zeros_like(X)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Interior points: zero at local extrema, weighted harmonic mean elsewhere
+        hl, hr = h[:, :-1], h[:, 1:]
+        dl, dr = delta[:, :-1], delta[:, 1:]
+        w1, w2 = 2 * hr + hl, hr + 2 * hl
+        interior = (w1 + w2) / (w1 / dl + w2 / dr)
+        monotone = (np.sign(dl) * np.sign(dr) > 0) & np.isfinite(interior)
+        D[:, 1:-1] = np.where(monotone, interior, 0.0)
+
+    rows = np.arange(len(counts))
+    last = np.maximum(counts - 1, 0)
+    long = counts >= 3
+    if h.shape[1] >= 2:
+        r = rows[long]
+        D[r, 0] = _pchip_edge(h[r, 0], h[r, 1], delta[r, 0], delta[r, 1])
+        n = last[long]
+        D[r, n] = _pchip_edge(
+            h[r, n - 1], h[r, n - 2], delta[r, n - 1], delta[r, n - 2]
+        )
+
+    # Two points: the straight line
+    two = rows[counts == 2]
+    D[two, 0] = D[two, 1] = delta[two, 0]
+    return D
+
+
+def _spline_slopes(X, Y, counts):
+    """
+    Derivatives of the natural cubic spline at every valid point.
+
+    The tridiagonal systems of all the series are solved together, the Thomas
+    algorithm looping over the points and not over the series.
+
+    Args:
+        X (np.ndarray): Packed years, see _pack
+        Y (np.ndarray): Packed values
+        counts (np.ndarray): Number of valid points of each series
+
+    Returns:
+        np.ndarray: Packed derivatives
+    """
+    import numpy as np
+
+    n_series, n_points = X.shape
+    h = np.diff(X, axis=1)
+    delta = np.diff(Y, axis=1) / h
+
+    # System a[k] * D[k-1] + b[k] * D[k] + c[k] * D[k+1] = r[k]: every segment
+    # adds its terms to the equations of its two ends (natural end conditions)
+    segments = np.arange(n_points - 1)[None, :] < (counts[:, None] - 1)
+    inv_h = np.where(segments, 1 / np.where(segments, h, 1), 0.0)
+    term = 3 * np.where(segments, delta, 0.0) * inv_h
+    a, b, c, r = (np.zeros((n_series, n_points)) for _ in range(4))
+    a[:, 1:] = inv_h
+    c[:, :-1] = inv_h
+    b[:, 1:] += 2 * inv_h
+    b[:, :-1] += 2 * inv_h
+    r[:, 1:] += term
+    r[:, :-1] += term
+    # Padding and single points: D = 0
+    b[b == 0] = 1.0
+
+    # Forward sweep then back substitution, vectorized over the series
+    cp = np.zeros_like(X)
+    rp = np.zeros_like(X)
+    cp[:, 0] = c[:, 0] / b[:, 0]
+    rp[:, 0] = r[:, 0] / b[:, 0]
+    for k in range(1, n_points):
+        m = b[:, k] - a[:, k] * cp[:, k - 1]
+        cp[:, k] = c[:, k] / m
+        rp[:, k] = (r[:, k] - a[:, k] * rp[:, k - 1]) / m
+    D = np.zeros_like(X)
+    D[:, -1] = rp[:, -1]
+    for k in range(n_points - 2, -1, -1):
+        D[:, k] = rp[:, k] - cp[:, k] * D[:, k + 1]
+    return D
+
+
+def interpolate_series(values, groups, years, method="linear", extrapolate="none"):
+    """
+    Interpolates many series stacked in one column, all at once.
+
+    Args:
+        values (pd.Series): Stacked values, NaN where missing
+        groups (pd.Series): Series each value belongs to, e.g. the country
+        years (pd.Series): Year of each value
+        method (str): "linear", "pchip" (shape-preserving cubic), "spline"
+            (natural cubic spline) or "log-linear" (linear on the logarithm,
+            i.e. constant growth rate, for positive values)
+        extrapolate (str): Outside the valid values of a series, "none" leaves
+            NaN, "ffill" repeats the last value after it and leaves NaN before the
+            first one (like Series.interpolate), "hold" repeats the nearest value
+            and "linear" extends the line through the two nearest values (the
+            log-line for "log-linear")
+
+    Returns:
+        pd.Series: The interpolated values, with the index of values
+
+    Raises:
+        ValueError: If method or extrapolate is unknown, or if log-linear
+            interpolation gets a value that is not positive
+    """
+    import numpy as np
+    import pandas as pd
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    if extrapolate not in EXTRAPOLATIONS:
+        raise ValueError(
+            f"Unknown extrapolation {extrapolate!r}, expected one of {EXTRAPOLATIONS}"
+        )
+
+    y = values.to_numpy(dtype=float)
+    x = years.to_numpy(dtype=float)
+    if method == "log-linear":
+        if (y[~np.isnan(y)] <= 0).any():
+            raise ValueError("log-linear interpolation needs positive values")
+        y = np.log(y)
+    codes, _ = pd.factorize(groups, use_na_sentinel=False)
+
+    result = np.full(len(y), np.nan)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) == 0:
+        return pd.Series(result, index=values.index, name=values.name)
+
+    # Valid points sorted by series then year, the segment of every row is found
+    # by a single search on a (series, year) key
+    valid = valid[np.lexsort((x[valid], codes[valid]))]
+    gv, xv, yv = codes[valid], x[valid], y[valid]
+    span = x.max() - x.min() + 2
+    j = np.searchsorted(
+        gv * span + (xv - x.min()), codes * span + (x - x.min()), "right"
+    )
+    n = len(valid)
+    jl = np.clip(j - 1, 0, n - 1)
+    jr = np.clip(j, 0, n - 1)
+    has_left = (j > 0) & (gv[jl] == codes)
+    has_right = (j < n) & (gv[jr] == codes)
+
+    at = has_left & (xv[jl] == x)
+    inside = has_left & has_right & ~at
+    left, right = jl[inside], jr[inside]
+    h = xv[right] - xv[left]
+    if method in ("linear", "log-linear"):
+        # Same arithmetic as np.interp, which Series.interpolate relies on
+        slope = (yv[right] - yv[left]) / h
+        result[inside] = slope * (x[inside] - xv[left]) + yv[left]
+    else:
+        X, Y, counts, k = _pack(gv, xv, yv)
+        slopes = _pchip_slopes if method == "pchip" else _spline_slopes
+        d = slopes(X, Y, counts)[gv, k]
+        t = (x[inside] - xv[left]) / h
+        result[inside] = (
+            (2 * t**3 - 3 * t**2 + 1) * yv[left]
+            + (t**3 - 2 * t**2 + t) * h * d[left]
+            + (-2 * t**3 + 3 * t**2) * yv[right]
+            + (t**3 - t**2) * h * d[right]
+        )
+    result[at] = yv[jl[at]]
+
+    if extrapolate != "none":
+        # Before the first value the nearest point is on the right, and after the
+        # last one on the left; the second nearest is one step further. "ffill"
+        # only fills after the last value
+        before = ~has_left & has_right & (extrapolate != "ffill")
+        after = has_left & ~has_right & ~at
+        for rows, near, step in ((before, jr, 1), (after, jl, -1)):
+            nearest = near[rows]
+            result[rows] = yv[nearest]
+            if extrapolate == "linear":
+                # A series with a single value stays flat
+                second = np.clip(nearest + step, 0, n - 1)
+                paired = (gv[second] == gv[nearest]) & (second != nearest)
+                rise = np.where(paired, yv[second] - yv[nearest], 0.0)
+                run = np.where(paired, xv[second] - xv[nearest], 1.0)
+                slope = rise / run
+                result[rows] += slope * (x[rows] - xv[nearest])
+
+    if method == "log-linear":
+        result = np.exp(result)
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def interpolate_frame(
+    df,
+    value_column,
+    method="linear",
+    start_year=None,
+    end_year=None,
+    extrapolate="none",
+    entity_column="Entity",
+    year_column="Year",
+    code_column="Code",
+):
+    """
+    Completes the years of every entity of an OWID-style long table and
+    interpolates its value column.
+
+    Args:
+        df (pd.DataFrame): Long table, one row per entity and year
+        value_column (str): Column to interpolate
+        method (str): Interpolation method, see interpolate_series
+        start_year (int): First year of every entity, its first year in the data
+            if None
+        end_year (int): Last year of every entity, its last year in the data if
+            None; later years are dropped
+        extrapolate (str): Extrapolation policy, see interpolate_series
+        entity_column (str): Column holding the entities
+        year_column (str): Column holding the years
+        code_column (str): Column holding the entity codes, given to the added
+            years
+
+    Returns:
+        pd.DataFrame: The completed table, with the year, entity and code columns
+        first, sorted by entity and year
+    """
+    import numpy as np
+    import pandas as pd
+
+    entity_years = df.groupby(entity_column, sort=False)[year_column]
+    first = entity_years.min()
+    last = entity_years.max()
+    if start_year is not None:
+        first = pd.Series(start_year, index=first.index)
+    if end_year is not None:
+        last = pd.Series(end_year, index=first.index)
+    lengths = (last - first + 1).clip(lower=0).to_numpy()
+
+    # One (entity, year) index for all the entities
+    entities = np.repeat(first.index.to_numpy(), lengths)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    years = np.arange(lengths.sum()) - offsets + np.repeat(first.to_numpy(), lengths)
+    full_index = pd.MultiIndex.from_arrays(
+        [entities, years], names=[entity_column, year_column]
+    )
+
+    # Reindex the data on it, the added years take the code of their entity
+    result = df.set_index([entity_column, year_column]).reindex(full_index)
+    result = result.reset_index()
+    key_columns = [year_column, entity_column]
+    if code_column in df.columns:
+        codes = df.groupby(entity_column, sort=False)[code_column].first()
+        result[code_column] = codes.reindex(entities).to_numpy()
+        key_columns.append(code_column)
+    result = result[key_columns + [c for c in df.columns if c not in key_columns]]
+
+    result[value_column] = interpolate_series(
+        result[value_column],
+        result[entity_column],
+        result[year_column],
+        method,
+        extrapolate,
+    )
+    return result.sort_values([entity_column, year_column])
+
+
+def interpolate_csv(filename, value_column, output_filename=None, **options):
+    """
+    Interpolates the value column of an OWID CSV file.
+
+    Args:
+        filename (str): Path to the OWID CSV file
+        value_column (str): Column to interpolate
+        output_filename (str): Output path, filename with an _interpolated suffix
+            if not given
+        **options: Options of interpolate_frame
+
+    Returns:
+        str: The output path
+    """
+    import pandas as pd
+
+    df = pd.read_csv(filename)
+    result = interpolate_frame(df, value_column, **options)
+
+    if output_filename is None:
+        output_filename = filename.replace(".csv", "_interpolated.csv")
+    result.to_csv(output_filename, index=False)
+    return output_filename
+
+
+def to_ameco(filename, value_column, output_file, title=None, unit=""):
+    """
+    Converts an interpolated OWID CSV file into an AMECO-style wide table.
+
+    Args:
+        filename (str): Path to the interpolated CSV file
+        value_column (str): Column holding the values
+        output_file (str): Output path, see owid_ameco.write_ameco
+        title (str): TITLE of the series, value_column if not given
+        unit (str): UNIT.1 of the series
+
+    Returns:
+        str: The output path
+    """
+    indicator = {
+        "source": filename,
+        "value_column": value_column,
+        "title": title,
+        "unit": unit,
+    }
+    return write_ameco(owid_to_ameco([indicator]), output_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Interpolate the missing years of an OWID indicator"
+    )
+    parser.add_argument("filename", help="OWID CSV file")
+    parser.add_argument("value_column", help="column to interpolate")
+    parser.add_argument("-o", "--output", help="interpolated CSV file")
+    parser.add_argument("--method", choices=METHODS, default="linear")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    parser.add_argument("--extrapolate", choices=EXTRAPOLATIONS, default="none")
+    parser.add_argument("--ameco", help="also write an AMECO-style table here")
+    parser.add_argument("--title", help="TITLE of the AMECO table")
+    parser.add_argument("--unit", default="", help="UNIT.1 of the AMECO table")
+    args = parser.parse_args(argv)
+
+    output = interpolate_csv(
+        args.filename,
+        args.value_column,
+        args.output,
+        method=args.method,
+        start_year=args.start_year,
+        end_year=args.end_year,
+        extrapolate=args.extrapolate,
+    )
+    print(f"Interpolated {args.filename} to {output}")
+    if args.ameco:
+        to_ameco(output, args.value_column, args.ameco, args.title, args.unit)
+        print(f"AMECO table written to {args.ameco}")
+
+
+if __name__ == "__main__":
+    main()
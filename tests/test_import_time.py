@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline  # noqa: E402
+
+
+def test_steps_import_within_budget():
+    seconds, heavy, ok = pipeline.check_import_time()
+    assert not heavy, f"imported at load time: {', '.join(heavy)}"
+    assert ok, f"steps imported in {seconds * 1000:.1f} ms"
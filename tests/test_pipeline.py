@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline  # noqa: E402
+
+
+def test_script_modules_follows_lazy_and_indirect_imports(tmp_path):
+    (tmp_path / "step.py").write_text(
+        "import os\n\n\ndef main():\n    from library import helper\n"
+    )
+    (tmp_path / "library.py").write_text("import shared\n\n\ndef helper():\n    pass\n")
+    (tmp_path / "shared.py").write_text("import step\n")
+    (tmp_path / "unused.py").write_text("")
+
+    modules = pipeline.script_modules(str(tmp_path / "step.py"))
+
+    assert modules == [str(tmp_path / "library.py"), str(tmp_path / "shared.py")]
+
+
+def test_ameco_data_depends_on_the_series_store():
+    step = next(s for s in pipeline.STEPS if s["name"] == "ameco_data")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    modules = pipeline.script_modules(os.path.join(root, step["script"]))
+
+    assert os.path.join(root, "ameco_store.py") in modules
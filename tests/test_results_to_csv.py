@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preprocess_ameco  # noqa: E402
+
+METADATA = [
+    "SERIES",
+    "CNTRY",
+    "TRN",
+    "AGG",
+    "UNIT",
+    "REF",
+    "CODE",
+    "COUNTRY",
+    "SUB-CHAPTER",
+    "TITLE",
+    "UNIT.1",
+]
+
+
+def _frame(series, values):
+    import pandas as pd
+
+    row = {column: f"{column.lower()} value" for column in METADATA}
+    row["SERIES"] = series
+    row["COUNTRY"] = "France"
+    row.update(values)
+    return pd.DataFrame([row])
+
+
+def test_parquet_keeps_text_columns_after_an_all_nan_one(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    # The first frame has no SERIES text at all, like WorkingHours.ameco.csv
+    frames = [
+        _frame(float("nan"), {1960: 1.5}),
+        _frame("AMECO.1", {1960: 2.0, 1961: 3}),
+    ]
+    filename = str(tmp_path / "out.parquet")
+    preprocess_ameco.results_to_csv(frames, filename, chunksize=1)
+
+    table = pq.read_table(filename)
+    assert table.column("SERIES").to_pylist() == [None, "AMECO.1"]
+    assert table.column("1961").to_pylist() == [None, 3.0]
+    assert table.schema.names[-2:] == ["1960", "1961"]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import series_interpolation  # noqa: E402
+
+
+def test_ffill_keeps_leading_nan_like_series_interpolate():
+    import numpy as np
+    import pandas as pd
+
+    values = pd.Series([np.nan, 0.3, np.nan, 0.5, np.nan, np.nan, 2.0, np.nan])
+    groups = pd.Series(["FR"] * 6 + ["DE"] * 2)
+    years = pd.Series([2000, 2001, 2002, 2003, 2004, 2005, 2000, 2001])
+
+    result = series_interpolation.interpolate_series(
+        values, groups, years, extrapolate="ffill"
+    )
+
+    expected = pd.concat(
+        [
+            values[:6].interpolate(method="linear"),
+            values[6:].interpolate(method="linear"),
+        ]
+    )
+    pd.testing.assert_series_equal(result, expected)
+    assert np.isnan(result[0])
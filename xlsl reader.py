@@ -1,48 +1,43 @@
-import pandas as pd
 import os
 
+from ameco_cache import load_workbooks
+from ameco_index import find_keys, load_index, lookup, rows_by_file
+
 
 def find_deflator_rows():
     # Get all xlsx files in current directory
-    xlsx_files = [f for f in os.listdir(".") if f.endswith((".XLSX", ".xlsx"))]
+    xlsx_files = sorted(f for f in os.listdir(".") if f.endswith((".XLSX", ".xlsx")))
 
     if not xlsx_files:
         print("No Excel files found in current directory")
         return
 
+    # Read the Excel files through the shared workbook cache
+    excel_files, errors = load_workbooks(xlsx_files)
+    for file in xlsx_files:
+        if file in errors:
+            print(f"Error reading file {file}: {str(errors[file])}")
+
+    # Titles containing 'Financial' (case insensitive), looked up in the series index
+    index = load_index(excel_files)
+    titles = find_keys(index, "title", ["Financial"])
+
     # Set to store unique file-title pairs
     seen_pairs = set()
 
-    for file in xlsx_files:
-        try:
-            # Read the Excel file
-            df = pd.read_excel(file)
-
-            # Check if 'TITLE' column exists
-            if "TITLE" not in df.columns:
-                print(f"Warning: File {file} does not contain a 'TITLE' column")
-                continue
-
-            # Filter rows where TITLE contains 'deflator' (case insensitive)
-            deflator_rows = df[
-                df["TITLE"].str.contains("Financial", case=False, na=False)
-            ]
-
-            if not deflator_rows.empty:
-                # Only print the TITLE column values
-                for title in deflator_rows["TITLE"]:
-                    # Create a tuple of file and title
-                    pair = (file, title)
-                    # Only print if we haven't seen this pair before
-                    if pair not in seen_pairs:
-                        print(f"File: {file} - Title: {title}")
-                        seen_pairs.add(pair)
-
-        except Exception as e:
-            print(f"Error reading file {file}: {str(e)}")
+    for df in rows_by_file(index, excel_files, lookup(index, title=titles)):
+        for title in df.iloc[:, 9]:
+            # Create a tuple of file and title
+            pair = (df.attrs["path"], title)
+            # Only print if we haven't seen this pair before
+            if pair not in seen_pairs:
+                print(f"File: {pair[0]} - Title: {title}")
+                seen_pairs.add(pair)
 
 
 def export_all_titles_to_csv():
+    import pandas as pd
+
     # Get all xlsx files in current directory
     xlsx_files = [f for f in os.listdir(".") if f.endswith((".XLSX", ".xlsx"))]
 
@@ -50,28 +45,29 @@ def export_all_titles_to_csv():
         print("No Excel files found in current directory")
         return
 
+    # Read the Excel files through the shared workbook cache
+    excel_files, errors = load_workbooks(xlsx_files)
+    for file in xlsx_files:
+        if file in errors:
+            print(f"Error reading file {file}: {str(errors[file])}")
+
     # Create a list to store all titles and their source files
     all_titles = []
 
-    for file in xlsx_files:
-        try:
-            # Read the Excel file
-            df = pd.read_excel(file)
-
-            # Check if 'TITLE' column exists
-            if "TITLE" not in df.columns:
-                print(f"Warning: File {file} does not contain a 'TITLE' column")
-                continue
+    for df in excel_files:
+        file = df.attrs["path"]
 
-            # Get all titles from the file
-            titles = df["TITLE"].dropna()  # Remove any NA values
+        # Check if 'TITLE' column exists
+        if "TITLE" not in df.columns:
+            print(f"Warning: File {file} does not contain a 'TITLE' column")
+            continue
 
-            # Add each title with its source file to the list
-            for title in titles:
-                all_titles.append({"File": file, "Title": title})
+        # Get all titles from the file
+        titles = df["TITLE"].dropna()  # Remove any NA values
 
-        except Exception as e:
-            print(f"Error reading file {file}: {str(e)}")
+        # Add each title with its source file to the list
+        for title in titles:
+            all_titles.append({"File": file, "Title": title})
 
     # Create a DataFrame from all collected titles
     titles_df = pd.DataFrame(all_titles)